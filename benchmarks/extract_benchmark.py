@@ -0,0 +1,152 @@
+## End-to-end benchmark of the extract stage against the replay server. Reports bytes/s, records/s and the peak memory of every source parser
+## `python benchmarks/extract_benchmark.py` (after `python benchmarks/fixtures.py generate`). Use --save and --compare to catch regressions
+import argparse
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import time
+import tracemalloc
+from loguru import logger
+from fixtures import BASE_DIR, load_meta
+from replay_server import replay_settings, start_replay_server
+
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0,str(BASE_DIR))
+
+REPEAT = 5
+TOLERANCE = 0.8 # a source is a regression if it reaches less than 80% of the saved records/s
+
+def run_extract(country,url):
+    """
+    Runs `download_covid_data` for one country against the replay server, without the store
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    url : str
+        The url of the fixture
+
+    Returns
+    -------
+    float
+        The elapsed seconds
+    int
+        The number of days returned
+    """
+    from country_settings import get_attributes
+    from extract_data import download_covid_data
+    attributes=get_attributes(country)
+    attributes.url=url
+    start_time=time.perf_counter()
+    ordinals,cases,tests=download_covid_data(attributes,country,as_columns=True)
+    return time.perf_counter()-start_time, len(ordinals)
+
+def benchmark(countries,settings,repeat=REPEAT,memory=True):
+    """
+    Measures every source: the fastest of `repeat` runs for the throughput and one run with tracemalloc for the peak memory
+
+    Parameters
+    ----------
+    countries : list
+        A list of two letter country codes e.g. ['de','fr']
+    settings : replay_settings
+        Latency, bandwidth and failure injection of the replay server
+    repeat : int
+        Optional. The number of timed runs per source
+    memory : bool
+        Optional. If False the (slower) memory run is skipped
+
+    Returns
+    -------
+    dict
+        The country code as key and a dictionary with seconds, bytes_per_s, records_per_s, peak_mb, days and the number of failed runs as value
+    """
+    server,base_url=start_replay_server(settings=settings)
+    results={}
+    try:
+        for country in countries:
+            meta=load_meta(country)
+            runs=[]
+            failures=0
+            for ix in range(repeat+1):
+                try:
+                    run=run_extract(country,f'{base_url}/{country}')
+                    if ix>0: # the first run imports the source module and warms up the connection pool
+                        runs.append(run)
+                except Exception:
+                    failures+=1 # e.g. an injected connection drop in a source which is not spooled
+            if len(runs)==0:
+                results[country]=dict(seconds=None,bytes_per_s=None,records_per_s=None,peak_mb=None,days=None,failures=failures)
+                continue
+            seconds=min(run[0] for run in runs)
+            peak_mb=None
+            if memory:
+                tracemalloc.start()
+                try:
+                    run_extract(country,f'{base_url}/{country}')
+                    peak_mb=tracemalloc.get_traced_memory()[1]/2**20
+                except Exception:
+                    failures+=1
+                tracemalloc.stop()
+            results[country]=dict(seconds=seconds,bytes_per_s=meta['bytes']/seconds,records_per_s=meta['rows']/seconds,peak_mb=peak_mb,days=runs[0][1],failures=failures)
+    finally:
+        server.shutdown()
+    return results
+
+def report(results,baseline=None):
+    """
+    Prints the results as a table, next to the saved baseline if there is one
+
+    Returns
+    -------
+    list
+        The countries which are slower than `TOLERANCE` times the baseline or failed in every run
+    """
+    print(f'{"source":<8}{"seconds":>10}{"MB/s":>10}{"records/s":>14}{"peak MB":>10}{"days":>7}{"failed":>8}{"vs. baseline":>14}')
+    regressions=[]
+    for country,result in results.items():
+        if result['seconds'] is None:
+            print(f'{country:<8}{"all runs failed":>51}{result["failures"]:>8}')
+            regressions.append(country)
+            continue
+        ratio=''
+        if baseline is not None and country in baseline:
+            speedup=result['records_per_s']/baseline[country]['records_per_s']
+            ratio=f'{speedup:.2f}x'
+            if speedup<TOLERANCE:
+                regressions.append(country)
+        peak=f'{result["peak_mb"]:.1f}' if result['peak_mb'] is not None else '-'
+        print(f'{country:<8}{result["seconds"]:>10.3f}{result["bytes_per_s"]/2**20:>10.1f}{result["records_per_s"]:>14,.0f}{peak:>10}{result["days"]:>7}{result["failures"]:>8}{ratio:>14}')
+    return regressions
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Benchmarks the source parsers against the replay server')
+    parser.add_argument('countries',nargs='*',default=['de','fr','at','be','lv'])
+    parser.add_argument('--repeat',type=int,default=REPEAT)
+    parser.add_argument('--latency',type=float,default=0.0)
+    parser.add_argument('--bandwidth',type=float,default=None)
+    parser.add_argument('--drop-rate',type=float,default=0.0)
+    parser.add_argument('--error-rate',type=float,default=0.0)
+    parser.add_argument('--no-memory',action='store_true',help='skip the tracemalloc run')
+    parser.add_argument('--save',help='write the results to a json file')
+    parser.add_argument('--compare',help='compare with the results of an earlier --save and exit with 1 on a regression')
+    args=parser.parse_args()
+
+    logger.remove()
+    logger.add(sys.stderr,level='CRITICAL') # failed runs are counted in the report
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir) # the download cache and the spool files of the runs are thrown away
+        settings=replay_settings(args.latency,args.bandwidth,args.drop_rate,args.error_rate)
+        results=benchmark(args.countries,settings,args.repeat,memory=not args.no_memory)
+        if settings.dropped+settings.errors>0:
+            print(f'Replay server: {settings.requests} requests, {settings.dropped} dropped connections, {settings.errors} errors')
+    baseline=json.loads(pathlib.Path(args.compare).read_text()) if args.compare else None
+    regressions=report(results,baseline)
+    if args.save:
+        pathlib.Path(args.save).write_text(json.dumps(results,indent=2))
+    if len(regressions)>0:
+        print(f'Regressions: {", ".join(regressions)}')
+        sys.exit(1)
@@ -0,0 +1,200 @@
+## Recorded responses of the sources for offline runs. A fixture is the response body (`<country>.body`) and its metadata (`<country>.json`)
+## `python benchmarks/fixtures.py record de fr` stores the live responses, `python benchmarks/fixtures.py generate` writes synthetic data in the same formats
+import argparse
+import csv
+import hashlib
+import io
+import json
+import math
+import pathlib
+import random
+import sys
+from datetime import date, timedelta
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0,str(BASE_DIR))
+
+FIXTURE_FOLDER = pathlib.Path(__file__).resolve().parent/'fixtures'
+FIRST_DAY = date(2020,3,1)
+LAST_MODIFIED = 'Sun, 01 Mar 2020 00:00:00 GMT'
+CONTENT_TYPES = {'de': 'application/json', 'fr': 'text/csv', 'at': 'text/csv', 'be': 'application/json', 'lv': 'application/json'}
+
+AT_REGIONS = [('Burgenland',294436),('Kärnten',561293),('Niederösterreich',1684287),('Oberösterreich',1490279),('Salzburg',558410),
+              ('Steiermark',1246395),('Tirol',757634),('Vorarlberg',397139),('Wien',1911191)]
+BE_PROVINCES = [('Antwerpen','Flanders'),('BrabantWallon','Wallonia'),('Brussels','Brussels'),('Hainaut','Wallonia'),('Limburg','Flanders'),('Liège','Wallonia'),
+                ('Luxembourg','Wallonia'),('Namur','Wallonia'),('OostVlaanderen','Flanders'),('VlaamsBrabant','Flanders'),('WestVlaanderen','Flanders')]
+DE_DISTRICTS = [(1,'Schleswig-Holstein','SK Kiel','01002'),(2,'Hamburg','SK Hamburg','02000'),(5,'Nordrhein-Westfalen','SK Köln','05315'),
+                (8,'Baden-Württemberg','SK Stuttgart','08111'),(9,'Bayern','SK München','09162'),(11,'Berlin','SK Berlin Mitte','11001'),(14,'Sachsen','SK Dresden','14612')]
+DE_AGE_GROUPS = ['A00-A04','A05-A14','A15-A34','A35-A59','A60-A79','A80+','unbekannt']
+
+def fixture_paths(country):
+    """
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the response body
+    pathlib.Path
+        The path of the metadata
+    """
+    return FIXTURE_FOLDER/f'{country}.body', FIXTURE_FOLDER/f'{country}.json'
+
+def load_meta(country):
+    """ Returns the metadata of a fixture: the original url, the response headers and the number of records """
+    return json.loads(fixture_paths(country)[1].read_text())
+
+def write_fixture(country,body,rows,url,headers=None):
+    """
+    Stores a response body and its metadata
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    body : bytes
+        The (decoded) response body
+    rows : int
+        The number of records the parser of the country reads from this body
+    url : str
+        The url the body was (or would be) downloaded from
+    headers : dict
+        Optional. The recorded response headers. Defaults to a content type, an ETag derived from the body and a fixed Last-Modified date
+    """
+    body_path,meta_path=fixture_paths(country)
+    FIXTURE_FOLDER.mkdir(exist_ok=True)
+    if headers is None:
+        headers={'Content-Type': CONTENT_TYPES[country], 'ETag': f'"{hashlib.sha1(body).hexdigest()[:16]}"', 'Last-Modified': LAST_MODIFIED}
+    body_path.write_bytes(body)
+    meta_path.write_text(json.dumps(dict(url=url,headers=headers,rows=rows,bytes=len(body)),indent=2))
+
+def count_records(country_attributes,body):
+    """ Counts the csv rows or the json objects below `json_items` of a body, i.e. the records a parser reads """
+    if country_attributes.csv:
+        return sum(1 for _ in csv.reader(io.StringIO(body.decode(country_attributes.csv_encoding)),delimiter=country_attributes.csv_separator))-1
+    import ijson
+    return sum(1 for _ in ijson.items(io.BytesIO(body),country_attributes.json_items))
+
+def record(countries):
+    """
+    Downloads the live responses of the sources and stores them as fixtures
+
+    Parameters
+    ----------
+    countries : list
+        A list of two letter country codes e.g. ['de','fr']
+    """
+    from country_settings import get_attributes
+    from http_session import get_session, TIMEOUT
+    for country in countries:
+        attributes=get_attributes(country)
+        response=get_session(attributes).get(attributes.url,timeout=TIMEOUT)
+        response.raise_for_status()
+        headers={key: response.headers[key] for key in ('Content-Type','ETag','Last-Modified') if key in response.headers}
+        write_fixture(country,response.content,count_records(attributes,response.content),attributes.url,headers)
+        print(f'{country}: recorded {len(response.content):,} bytes')
+
+def daily_cases(day,scale):
+    """ A smooth, deterministic epidemic curve with a weekly reporting pattern """
+    wave=1.2+math.sin(day/45)+0.5*math.sin(day/13)
+    weekday=0.6 if (FIRST_DAY+timedelta(days=day)).weekday()>=5 else 1.0
+    return max(0,int(scale*wave*weekday))
+
+def generate_de(days,records_per_day,rnd):
+    """ Features of the RKI geojson. Every day is split into `records_per_day` features over districts, age groups and sexes """
+    features=[]
+    for day in range(days):
+        total=daily_cases(day,records_per_day*20)
+        meldedatum=(FIRST_DAY+timedelta(days=day)).isoformat()+'T00:00:00.000Z'
+        for _ in range(records_per_day):
+            id_state,state,district,id_district=rnd.choice(DE_DISTRICTS)
+            features.append({'type': 'Feature', 'properties': {'IdBundesland': id_state, 'Bundesland': state, 'Landkreis': district,
+                'Altersgruppe': rnd.choice(DE_AGE_GROUPS), 'Geschlecht': rnd.choice('MWU'), 'AnzahlFall': rnd.randint(0,2*total//records_per_day+1) if total>0 else 0,
+                'AnzahlTodesfall': 0, 'ObjectId': len(features), 'Meldedatum': meldedatum, 'IdLandkreis': id_district, 'Datenstand': '01.03.2020, 00:00 Uhr', 'NeuerFall': 0}})
+    body=json.dumps({'type': 'FeatureCollection', 'features': features}).encode()
+    return body, len(features)
+
+def generate_fr(days,rnd):
+    """ The synthesis of the indicators: date, positive tests and the positive rate in percent """
+    lines=['date,pos,tx_pos']
+    for day in range(days):
+        lines.append(f'{(FIRST_DAY+timedelta(days=day)).isoformat()},{daily_cases(day,8000)},{rnd.uniform(1,12):.2f}')
+    return ('\n'.join(lines)+'\n').encode('latin'), days
+
+def generate_at(days,rnd):
+    """ The AGES timeline: one row per Bundesland and day plus the sum 'Österreich' """
+    lines=['Time;Bundesland;BundeslandID;AnzEinwohner;AnzahlFaelle;AnzahlFaelleSum']
+    sums=[0]*(len(AT_REGIONS)+1)
+    for day in range(days):
+        time=(FIRST_DAY+timedelta(days=day)).strftime('%d.%m.%Y 00:00:00')
+        national=0
+        for ix,(region,population) in enumerate(AT_REGIONS):
+            cases=daily_cases(day,population//2000)+rnd.randint(0,5)
+            national+=cases
+            sums[ix]+=cases
+            lines.append(f'{time};{region};{ix+1};{population};{cases};{sums[ix]}')
+        sums[-1]+=national
+        lines.append(f'{time};Österreich;10;{sum(population for _,population in AT_REGIONS)};{national};{sums[-1]}')
+    return ('\n'.join(lines)+'\n').encode('utf-8'), days*(len(AT_REGIONS)+1)
+
+def generate_be(days,rnd):
+    """ The Sciensano tests: one item per province and day and a trailing item without date or province, like the original """
+    items=[]
+    for day in range(days):
+        for province,region in BE_PROVINCES:
+            tests=daily_cases(day,1500)+rnd.randint(100,500)
+            items.append({'DATE': (FIRST_DAY+timedelta(days=day)).isoformat(), 'PROVINCE': province, 'REGION': region, 'TESTS_ALL': tests, 'TESTS_ALL_POS': tests//rnd.randint(8,30)})
+    items.append({'DATE': None, 'PROVINCE': None, 'REGION': None, 'TESTS_ALL': 0, 'TESTS_ALL_POS': 0})
+    return json.dumps(items).encode(), len(items)
+
+def generate_lv(days,rnd):
+    """ The data.gov.lv datastore search result. Some numbers are strings, like in the original """
+    records=[]
+    for day in range(days):
+        tests=daily_cases(day,3000)+rnd.randint(100,900)
+        cases=tests//rnd.randint(10,40)
+        records.append({'_id': day, 'Datums': (FIRST_DAY+timedelta(days=day)).isoformat()+'T00:00:00',
+            'TestuSkaits': str(tests) if day%5==0 else tests, 'ApstiprinataCOVID19InfekcijaSkaits': str(cases) if day%5==0 else cases})
+    return json.dumps({'success': True, 'result': {'records': records}}).encode(), len(records)
+
+def generate(countries,days=365,de_records_per_day=4,seed=0):
+    """
+    Writes synthetic fixtures in the formats of the sources. The content only depends on the arguments, so benchmark runs are comparable
+
+    Parameters
+    ----------
+    countries : list
+        A list of two letter country codes e.g. ['de','fr']
+    days : int
+        Optional. The number of days of each series
+    de_records_per_day : int
+        Optional. The number of German features per day. The real geojson has several thousand
+    seed : int
+        Optional. The seed of the random numbers
+    """
+    from country_settings import get_attributes
+    for country in countries:
+        rnd=random.Random(f'{seed}-{country}')
+        if country=='de':
+            body,rows=generate_de(days,de_records_per_day,rnd)
+        else:
+            body,rows=globals()[f'generate_{country}'](days,rnd)
+        write_fixture(country,body,rows,get_attributes(country).url)
+        print(f'{country}: generated {len(body):,} bytes, {rows:,} records')
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Records or generates the response fixtures of the sources')
+    parser.add_argument('mode',choices=['record','generate'])
+    parser.add_argument('countries',nargs='*',default=['de','fr','at','be','lv'])
+    parser.add_argument('--days',type=int,default=365,help='generate: number of days')
+    parser.add_argument('--de-records-per-day',type=int,default=4,help='generate: German features per day e.g. 5000 for a realistic size')
+    parser.add_argument('--seed',type=int,default=0)
+    args=parser.parse_args()
+    if args.mode=='record':
+        record(args.countries)
+    else:
+        generate(args.countries,args.days,args.de_records_per_day,args.seed)
@@ -0,0 +1,182 @@
+## Local stand-in for the source servers. Replays the fixtures (see fixtures.py) with configurable latency, bandwidth and failures
+## `python benchmarks/replay_server.py --port 8765 --latency 0.2 --bandwidth 2000000 --drop-rate 0.2` serves e.g. http://localhost:8765/de
+import argparse
+import gzip
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fixtures import fixture_paths, load_meta
+
+class replay_settings():
+    def __init__(self,latency=0.0,bandwidth=None,drop_rate=0.0,error_rate=0.0,seed=0):
+        """
+        Parameters
+        ----------
+        latency : float
+            Optional. Seconds to wait before the response headers are sent
+        bandwidth : float
+            Optional. The maximum bytes per second of each response body. None for no limit
+        drop_rate : float
+            Optional. The probability that the connection is closed somewhere in the middle of the body
+        error_rate : float
+            Optional. The probability of an answer with 503 Service Unavailable
+        seed : int
+            Optional. The seed of the failure injection, so a failing run can be repeated
+        """
+        self.latency=latency
+        self.bandwidth=bandwidth
+        self.drop_rate=drop_rate
+        self.error_rate=error_rate
+        self.random=random.Random(seed)
+        self.lock=threading.Lock()
+        self.bodies={}
+        self.requests=0
+        self.dropped=0
+        self.errors=0
+
+    def draw(self):
+        """
+        Returns the random numbers of one response. The generator and the counters are shared by all handler threads, so they are only used under the lock
+
+        Returns
+        -------
+        float
+            Decides between a 503 answer, a dropped connection and a complete body
+        float
+            The position of a drop as fraction of the remaining body
+        """
+        with self.lock:
+            self.requests+=1
+            return self.random.random(), self.random.random()
+
+    def count(self,name):
+        """ Increments the counter `name` ('dropped' or 'errors') """
+        with self.lock:
+            setattr(self,name,getattr(self,name)+1)
+
+    def body(self,country,encoding):
+        """ Returns the fixture body, gzip compressed if requested. The compressed body is created once """
+        key=(country,encoding)
+        with self.lock:
+            if key not in self.bodies:
+                body=fixture_paths(country)[0].read_bytes()
+                self.bodies[key]=gzip.compress(body,compresslevel=6,mtime=0) if encoding=='gzip' else body
+            return self.bodies[key]
+
+class replay_handler(BaseHTTPRequestHandler):
+    protocol_version='HTTP/1.1'
+    disable_nagle_algorithm=True # headers and body are separate writes; with Nagle a reused connection waits for the delayed ACK
+    settings=replay_settings()
+    chunk_size=1<<16
+
+    def do_GET(self):
+        """
+        Serves `/<country>` like the original source: ETag/Last-Modified with 304 answers to conditional requests,
+        Range requests with If-Range, and gzip content encoding if the client accepts it
+        """
+        country=self.path.strip('/').split('?')[0]
+        if not fixture_paths(country)[0].exists():
+            return self.reply_empty(404)
+        draw,drop_fraction=self.settings.draw()
+        time.sleep(self.settings.latency)
+        if draw<self.settings.error_rate:
+            self.settings.count('errors')
+            return self.reply_empty(503)
+
+        headers=load_meta(country)['headers']
+        etag=headers.get('ETag')
+        last_modified=headers.get('Last-Modified')
+        if (etag is not None and self.headers.get('If-None-Match')==etag) or (etag is None and last_modified is not None and self.headers.get('If-Modified-Since')==last_modified):
+            return self.reply_empty(304,headers)
+
+        encoding='gzip' if 'gzip' in self.headers.get('Accept-Encoding','') else None
+        body=self.settings.body(country,encoding)
+        start=0
+        requested_range=self.headers.get('Range')
+        if_range=self.headers.get('If-Range')
+        if requested_range is not None and requested_range.startswith('bytes=') and (if_range is None or if_range in (etag,last_modified)):
+            start=int(requested_range[len('bytes='):].split('-')[0] or 0)
+            if start>=len(body):
+                return self.reply_empty(416,{'Content-Range': f'bytes */{len(body)}'})
+
+        self.send_response(206 if start>0 else 200)
+        for key,value in headers.items():
+            self.send_header(key,value)
+        if encoding is not None:
+            self.send_header('Content-Encoding',encoding)
+        if start>0:
+            self.send_header('Content-Range',f'bytes {start}-{len(body)-1}/{len(body)}')
+        self.send_header('Accept-Ranges','bytes')
+        self.send_header('Content-Length',str(len(body)-start))
+        self.end_headers()
+
+        # the drop position is drawn per response, so a resumed download may fail again later in the body
+        drop_at=len(body)
+        if draw<self.settings.error_rate+self.settings.drop_rate:
+            drop_at=start+int((len(body)-start)*drop_fraction)
+        position=start
+        send_start=time.time()
+        while position<len(body):
+            if position>=drop_at:
+                self.settings.count('dropped')
+                self.close_connection=True
+                return
+            chunk=body[position:min(position+self.chunk_size,drop_at,len(body))]
+            self.wfile.write(chunk)
+            position+=len(chunk)
+            if self.settings.bandwidth is not None:
+                wait=(position-start)/self.settings.bandwidth-(time.time()-send_start)
+                if wait>0:
+                    time.sleep(wait)
+
+    def reply_empty(self,status,headers=None):
+        """ Sends a response without body """
+        self.send_response(status)
+        for key,value in (headers or {}).items():
+            self.send_header(key,value)
+        self.send_header('Content-Length','0')
+        self.end_headers()
+
+    def log_message(self,format,*args):
+        pass
+
+def start_replay_server(port=0,settings=None):
+    """
+    Starts the replay server in a background thread
+
+    Parameters
+    ----------
+    port : int
+        Optional. The port to listen on. 0 picks a free port
+    settings : replay_settings
+        Optional. Latency, bandwidth and failure injection. Defaults to a fast and reliable server
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The server. Call `shutdown` to stop it
+    str
+        The base url e.g. 'http://127.0.0.1:8765'
+    """
+    handler=type('configured_replay_handler',(replay_handler,),{'settings': settings or replay_settings()})
+    server=ThreadingHTTPServer(('127.0.0.1',port),handler)
+    server.daemon_threads=True
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Replays the recorded source responses')
+    parser.add_argument('--port',type=int,default=8765)
+    parser.add_argument('--latency',type=float,default=0.0,help='seconds before each response')
+    parser.add_argument('--bandwidth',type=float,default=None,help='bytes per second of each response')
+    parser.add_argument('--drop-rate',type=float,default=0.0,help='probability of a connection drop within the body')
+    parser.add_argument('--error-rate',type=float,default=0.0,help='probability of a 503 answer')
+    parser.add_argument('--seed',type=int,default=0)
+    args=parser.parse_args()
+    server,base_url=start_replay_server(args.port,replay_settings(args.latency,args.bandwidth,args.drop_rate,args.error_rate,args.seed))
+    print(f'Replaying fixtures on {base_url}/<country>. Press Ctrl+C to stop')
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,77 @@
+## Startup time report: measures what `python main.py` imports before any data is fetched, based on `python -X importtime`
+## Run from the base directory: `python benchmarks/startup_time.py`. The exit code is 1 if the startup budget is exceeded
+import subprocess
+import sys
+import pathlib
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ['numpy','ijson','plotly','sass','requests']   # must not be imported before their stage runs
+STAGE_MODULES = ['extract_data','transform_enrich','visuals_plotly','visuals_tabulator','sass','ijson']
+BUDGET_MS = 250                                                  # import time of the interpreter (site) and main.py
+REPEAT = 5
+
+def import_times(statement):
+    """
+    Runs a statement in a fresh interpreter with `-X importtime` and parses the report
+
+    Parameters
+    ----------
+    statement : str
+        The python code to run e.g. 'import main'
+
+    Returns
+    -------
+    dict
+        A dictionary with the module name as key and a tuple of (self time, cumulative time) in microseconds as value
+    int
+        The total import time in microseconds. The sum of the cumulative times of the top level imports
+    """
+    result=subprocess.run([sys.executable,'-X','importtime','-c',statement],cwd=BASE_DIR,capture_output=True,text=True,check=True)
+    times={}
+    total=0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us,cumulative_us,name=line[len('import time:'):].split('|')
+        module=name.strip()
+        times[module]=(int(self_us),int(cumulative_us))
+        if len(name)-len(name.lstrip())==1: # top level imports are indented by exactly one space
+            total+=int(cumulative_us)
+    return times, total
+
+def best_of(statement,repeat=REPEAT):
+    """ Runs `import_times` several times and keeps the fastest run, which is the least disturbed by the operating system """
+    runs=[import_times(statement) for _ in range(repeat)]
+    return min(runs,key=lambda run: run[1])
+
+def report(top=10):
+    """
+    Prints the import time of main.py next to the time it took with all stages imported eagerly
+
+    Parameters
+    ----------
+    top : int
+        Optional. The number of modules with the highest cumulative import time to list
+
+    Returns
+    -------
+    bool
+        True if main.py is within `BUDGET_MS` and imports none of the `HEAVY_MODULES`
+    """
+    times,total=best_of('import main')
+    _,eager_total=best_of('import main, '+', '.join(STAGE_MODULES))
+
+    print(f'interpreter and main.py:     {total/1000:8.1f} ms (budget {BUDGET_MS} ms)')
+    print(f'with all stages imported:    {eager_total/1000:8.1f} ms')
+    print(f'startup share:               {total/eager_total:8.1%}')
+    print(f'\n{"module":<40}{"self [ms]":>10}{"cumul. [ms]":>12}')
+    for module,(self_us,cumulative_us) in sorted(times.items(),key=lambda item: -item[1][1])[:top]:
+        print(f'{module:<40}{self_us/1000:>10.1f}{cumulative_us/1000:>12.1f}')
+
+    heavy=[module for module in HEAVY_MODULES if module in times]
+    if len(heavy)>0:
+        print(f'\nHeavy modules imported at startup: {", ".join(heavy)}')
+    return total/1000<=BUDGET_MS and len(heavy)==0
+
+if __name__=='__main__':
+    sys.exit(0 if report() else 1)
@@ -0,0 +1,242 @@
+## Count cube over categorical dimensions and days e.g. Landkreis x Altersgruppe x Geschlecht x date. The dimension values are dictionary encoded
+## and the cube is kept sparse: one row per non-empty cell with the codes of every dimension, the day ordinal and the count
+import numpy as np
+from loguru import logger
+from date_normalisation import to_iso
+
+class case_cube():
+    def __init__(self,dimensions,labels=None,codes=None,ordinals=None,counts=None):
+        """
+        Creates an empty cube or a cube from its columns. While the cube is filled the observations are buffered per group
+        (a distinct combination of dimension values) and summed chunk by chunk, see `add_group`, `add_chunk` and `finish`
+
+        Parameters
+        ----------
+        dimensions : list
+            The names of the dimensions e.g. ['Bundesland','Landkreis']
+        labels : dict
+            Optional. The dimension name as key and the list of labels as value. The code of a label is its index in the list
+        codes : dict
+            Optional. The dimension name as key and an int32 array with the code of every cell as value
+        ordinals : np.ndarray
+            Optional. The int32 day ordinal of every cell
+        counts : np.ndarray
+            Optional. The int64 count of every cell
+        """
+        self.dimensions=list(dimensions)
+        self.labels=labels if labels is not None else {dimension: [] for dimension in self.dimensions}
+        self.label_codes={dimension: {label: code for code,label in enumerate(self.labels[dimension])} for dimension in self.dimensions}
+        self.codes=codes if codes is not None else {dimension: np.zeros(0,dtype=np.int32) for dimension in self.dimensions}
+        self.ordinals=ordinals if ordinals is not None else np.zeros(0,dtype=np.int32)
+        self.counts=counts if counts is not None else np.zeros(0,dtype=np.int64)
+        self.group_codes=[]    # codes of each group while the cube is filled
+        self.partials=[]       # (group keys, counts) of every accumulated chunk
+
+    def add_group(self,values):
+        """
+        Encodes a distinct combination of dimension values. Call this once per combination and keep the returned id, e.g. in a dictionary
+
+        Parameters
+        ----------
+        values : tuple
+            One value per dimension, in the order of `dimensions`
+
+        Returns
+        -------
+        int
+            The group id used by `add_chunk`
+        """
+        group=[]
+        for dimension,value in zip(self.dimensions,values):
+            code=self.label_codes[dimension].get(value)
+            if code is None:
+                code=len(self.labels[dimension])
+                self.labels[dimension].append(value)
+                self.label_codes[dimension][value]=code
+            group.append(code)
+        self.group_codes.append(group)
+        return len(self.group_codes)-1
+
+    def add_chunk(self,groups,ordinals,counts):
+        """
+        Sums a chunk of observations per group and day. Only the (much smaller) sums are kept
+
+        Parameters
+        ----------
+        groups : array
+            The group id of each observation (see `add_group`)
+        ordinals : array
+            The day ordinal of each observation
+        counts : array
+            The count of each observation
+        """
+        if len(ordinals)==0:
+            return
+        keys=(np.frombuffer(groups,dtype=np.int64)<<32)|np.frombuffer(ordinals,dtype=np.int64)
+        keys,inverse=np.unique(keys,return_inverse=True)
+        self.partials.append((keys,np.bincount(inverse.ravel(),weights=np.frombuffer(counts,dtype=np.int64),minlength=len(keys)).astype(np.int64)))
+
+    def finish(self):
+        """
+        Combines the chunks to the cells of the cube. Cells of days which were only seen in a chunk are kept, even if their count is zero
+        """
+        try:
+            if len(self.partials)==0:
+                return self
+            keys=np.concatenate([partial[0] for partial in self.partials])
+            counts=np.concatenate([partial[1] for partial in self.partials])
+            keys,inverse=np.unique(keys,return_inverse=True)
+            self.counts=np.bincount(inverse.ravel(),weights=counts,minlength=len(keys)).astype(np.int64) # exact below 2**53, much faster than np.add.at
+            groups=(keys>>32).astype(np.int64)
+            group_codes=np.array(self.group_codes,dtype=np.int32).reshape(len(self.group_codes),len(self.dimensions))
+            for ix,dimension in enumerate(self.dimensions):
+                self.codes[dimension]=group_codes[groups,ix]
+            self.ordinals=(keys&0xFFFFFFFF).astype(np.int32)
+            self.partials=[]
+            return self
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+    def __len__(self):
+        """ The number of non-empty cells """
+        return len(self.counts)
+
+    def mask(self,selection):
+        """
+        Creates a boolean mask of the cells matching a selection
+
+        Parameters
+        ----------
+        selection : dict
+            The dimension name as key and a label or a list of labels as value. The key 'date' selects day ordinals: a (first, last) tuple or a list
+
+        Returns
+        -------
+        np.ndarray
+            A boolean array with one element per cell
+        """
+        keep=np.ones(len(self.counts),dtype=bool)
+        for dimension,value in selection.items():
+            if dimension=='date':
+                if isinstance(value,tuple):
+                    keep&=(self.ordinals>=value[0])&(self.ordinals<=value[1])
+                else:
+                    keep&=np.isin(self.ordinals,value)
+                continue
+            values=value if isinstance(value,(list,set)) else [value]
+            wanted=[self.label_codes[dimension][label] for label in values if label in self.label_codes[dimension]]
+            keep&=np.isin(self.codes[dimension],wanted)
+        return keep
+
+    def slice(self,**selection):
+        """
+        Selects a part of the cube e.g. `cube.slice(Bundesland='Bayern',Altersgruppe=['A60-A79','A80+'])`. The labels are shared with this cube
+
+        Parameters
+        ----------
+        **selection
+            See `mask`
+
+        Returns
+        -------
+        case_cube
+            A cube with the selected cells
+        """
+        keep=self.mask(selection)
+        return case_cube(self.dimensions,self.labels,{dimension: self.codes[dimension][keep] for dimension in self.dimensions},self.ordinals[keep],self.counts[keep])
+
+    def rollup(self,dimensions):
+        """
+        Sums the cube over all dimensions which are not kept e.g. `cube.rollup(['Bundesland'])` gives the daily counts per state
+
+        Parameters
+        ----------
+        dimensions : list
+            The dimensions to keep. The days are always kept
+
+        Returns
+        -------
+        case_cube
+            A cube with the kept dimensions
+        """
+        try:
+            sizes=[len(self.labels[dimension]) for dimension in dimensions]
+            key=np.zeros(len(self.counts),dtype=np.int64)
+            for dimension,size in zip(dimensions,sizes):
+                key=key*size+self.codes[dimension]
+            key=(key<<32)|self.ordinals.astype(np.int64)
+            key,inverse=np.unique(key,return_inverse=True)
+            counts=np.bincount(inverse.ravel(),weights=self.counts,minlength=len(key)).astype(np.int64)
+            group=key>>32
+            codes={}
+            for dimension,size in zip(reversed(dimensions),reversed(sizes)):
+                codes[dimension]=(group%size).astype(np.int32)
+                group=group//size
+            return case_cube(dimensions,{dimension: self.labels[dimension] for dimension in dimensions},codes,(key&0xFFFFFFFF).astype(np.int32),counts)
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+    def series(self,reversed_dates=True,**selection):
+        """
+        Creates the daily time series of a selection, summed over all other dimensions. Without a selection this is the national series
+
+        Parameters
+        ----------
+        reversed_dates : bool
+            A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+        **selection
+            Optional. See `mask`
+
+        Returns
+        -------
+        np.ndarray
+            The int32 day ordinals
+        np.ndarray
+            The int64 counts
+        """
+        cube=self.slice(**selection) if len(selection)>0 else self
+        ordinals,inverse=np.unique(cube.ordinals,return_inverse=True)
+        counts=np.bincount(inverse.ravel(),weights=cube.counts,minlength=len(ordinals)).astype(np.int64)
+        if reversed_dates:
+            ordinals,counts=ordinals[::-1],counts[::-1]
+        return ordinals.astype(np.int32), counts
+
+    def to_dense(self):
+        """
+        Creates a dense array with one axis per dimension and the days as last axis. Days without any observation are included
+
+        Returns
+        -------
+        np.ndarray
+            The int64 counts with the shape (len(labels) of each dimension..., number of days)
+        np.ndarray
+            The int32 day ordinals of the last axis, from oldest to most current date
+        """
+        if len(self.counts)==0:
+            return np.zeros([len(self.labels[dimension]) for dimension in self.dimensions]+[0],dtype=np.int64), np.zeros(0,dtype=np.int32)
+        first=int(self.ordinals.min())
+        days=np.arange(first,int(self.ordinals.max())+1,dtype=np.int32)
+        shape=[len(self.labels[dimension]) for dimension in self.dimensions]+[len(days)]
+        cells=np.ravel_multi_index(tuple(self.codes[dimension] for dimension in self.dimensions)+(self.ordinals-first,),shape)
+        dense=np.bincount(cells,weights=self.counts,minlength=int(np.prod(shape))).astype(np.int64).reshape(shape)
+        return dense, days
+
+    def to_dicts(self):
+        """
+        Returns
+        -------
+        list
+            A list with one dictionary per cell with the labels, the date in isoformat and the count e.g. for csv exports
+        """
+        rows=[]
+        codes=[self.codes[dimension].tolist() for dimension in self.dimensions]
+        for ix,(iso_date,count) in enumerate(zip(to_iso(self.ordinals),self.counts.tolist())):
+            row={dimension: self.labels[dimension][codes[dim_ix][ix]] for dim_ix,dimension in enumerate(self.dimensions)}
+            row['date']=iso_date
+            row['count']=count
+            rows.append(row)
+        return rows
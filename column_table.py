@@ -0,0 +1,69 @@
+## Named NumPy columns with O(1) lookup by name. Subsets (e.g. the 7 day columns) share the arrays of the table instead of copying them
+import numpy as np
+
+class column_table():
+    def __init__(self,names,columns):
+        """
+        Parameters
+        ----------
+        names : list
+            The column names e.g. ['Date','New Cases','7d mean']
+        columns : list
+            One array per name. The arrays are kept as they are (no copy), each with its own dtype
+        """
+        self.names=list(names)
+        self.columns=list(columns)
+        self.index={name: ix for ix,name in enumerate(self.names)}
+
+    def __getitem__(self,name):
+        """ Returns the column with this name """
+        return self.columns[self.index[name]]
+
+    def __contains__(self,name):
+        return name in self.index
+
+    def __len__(self):
+        """ The number of rows """
+        return len(self.columns[0]) if len(self.columns)>0 else 0
+
+    def items(self):
+        """ Iterates over (name, column) pairs in the order of the table """
+        return zip(self.names,self.columns)
+
+    def select(self,names):
+        """
+        Creates a table with a subset of the columns. The columns are shared, nothing is copied
+
+        Parameters
+        ----------
+        names : list
+            The column names in the order of the new table
+
+        Returns
+        -------
+        column_table
+            The subset
+        """
+        return column_table(names,[self[name] for name in names])
+
+    def window(self,window):
+        """
+        Selects the columns of one window size and all columns which do not depend on a window e.g. `table.window('7d')`
+
+        Parameters
+        ----------
+        window : str
+            The window tag used in the column names, '7d' or '14d'
+
+        Returns
+        -------
+        column_table
+            The subset, sharing the columns with this table
+        """
+        other_windows=[tag for tag in ('7d','14d') if tag!=window]
+        return self.select([name for name in self.names if not any(tag in name for tag in other_windows)])
+
+    @property
+    def nbytes(self):
+        """ The memory used by the columns """
+        return sum(np.asarray(column).nbytes for column in self.columns)
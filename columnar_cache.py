@@ -0,0 +1,125 @@
+## Columnar on-disk format for daily time series. The columns are raw arrays behind a small header and are opened with memory mapping
+import os
+import pathlib
+import struct
+from collections import OrderedDict
+import numpy as np
+from loguru import logger
+from date_normalisation import to_iso
+
+MAGIC = b'CCOL'
+VERSION = 1
+HEADER_FORMAT = '<4sHHq'             # magic, version, flags, number of rows
+HEADER_SIZE = 64                     # the header is padded, so every column starts 8-byte aligned
+FLAG_TESTS = 1
+MISSING = np.iinfo(np.int64).min     # marks a day without test data in the tests column
+
+ORDINAL_DTYPE = np.dtype('<i4')
+COUNT_DTYPE = np.dtype('<i8')
+
+def write_columns(path,ordinals,cases,tests=None):
+    """
+    Writes the columns to a file. The file is written next to the target and then moved, so readers never see a half written file
+
+    Parameters
+    ----------
+    path : str
+        The path of the file
+    ordinals : array_like
+        The day ordinals (see `date.toordinal`) sorted from oldest to most current date
+    cases : array_like
+        The new cases of each day
+    tests : array_like
+        Optional. The tests of each day. Missing values are marked with `MISSING`
+    """
+    try:
+        path=pathlib.Path(path)
+        ordinals=np.ascontiguousarray(ordinals,dtype=ORDINAL_DTYPE)
+        cases=np.ascontiguousarray(cases,dtype=COUNT_DTYPE)
+        flags=FLAG_TESTS if tests is not None else 0
+        header=struct.pack(HEADER_FORMAT,MAGIC,VERSION,flags,len(ordinals)).ljust(HEADER_SIZE,b'\0')
+
+        path.parent.mkdir(exist_ok=True)
+        tmp_path=path.with_suffix('.tmp')
+        with open(tmp_path,'wb') as f:
+            f.write(header)
+            f.write(ordinals.tobytes())
+            f.write(b'\0'*padding(ordinals.nbytes))
+            f.write(cases.tobytes())
+            if tests is not None:
+                f.write(np.ascontiguousarray(tests,dtype=COUNT_DTYPE).tobytes())
+        os.replace(tmp_path,path)
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def open_columns(path):
+    """
+    Opens the columns of a file with memory mapping. Nothing is copied: the pages are loaded by the operating system when they are read
+
+    Parameters
+    ----------
+    path : str
+        The path of the file
+
+    Returns
+    -------
+    np.ndarray
+        The read-only int32 day ordinals
+    np.ndarray
+        The read-only int64 cases
+    np.ndarray
+        The read-only int64 tests. None if the file has no tests column
+    """
+    try:
+        with open(path,'rb') as f:
+            magic,version,flags,rows=struct.unpack(HEADER_FORMAT,f.read(struct.calcsize(HEADER_FORMAT)))
+        if magic!=MAGIC or version!=VERSION:
+            raise ValueError(f'{path} is not a columnar cache file of version {VERSION}')
+        if rows==0:
+            return np.zeros(0,dtype=ORDINAL_DTYPE), np.zeros(0,dtype=COUNT_DTYPE), (np.zeros(0,dtype=COUNT_DTYPE) if flags & FLAG_TESTS else None)
+
+        buffer=np.memmap(path,dtype=np.uint8,mode='r')
+        offset=HEADER_SIZE
+        ordinals=buffer[offset:offset+rows*ORDINAL_DTYPE.itemsize].view(ORDINAL_DTYPE)
+        offset+=rows*ORDINAL_DTYPE.itemsize+padding(rows*ORDINAL_DTYPE.itemsize)
+        cases=buffer[offset:offset+rows*COUNT_DTYPE.itemsize].view(COUNT_DTYPE)
+        offset+=rows*COUNT_DTYPE.itemsize
+        tests=buffer[offset:offset+rows*COUNT_DTYPE.itemsize].view(COUNT_DTYPE) if flags & FLAG_TESTS else None
+        return ordinals, cases, tests
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def padding(nbytes):
+    """ Number of bytes needed to align the next column to 8 bytes """
+    return -nbytes % 8
+
+def columns_to_dicts(ordinals,cases,tests=None):
+    """
+    Formats the columns as the ordered dictionaries used by the rest of the pipeline. The order of the columns is kept
+
+    Parameters
+    ----------
+    ordinals : np.ndarray
+        The day ordinals
+    cases : np.ndarray
+        The new cases
+    tests : np.ndarray
+        Optional. The tests, missing values are marked with `MISSING`
+
+    Returns
+    -------
+    dict
+        An ordered dictionary with the dates in isoformat and the new cases
+    dict
+        An ordered dictionary with the dates in isoformat and tests. None if tests is None
+    """
+    dates=to_iso(ordinals)
+    cases_dict=OrderedDict(zip(dates,cases.tolist()))
+    tests_dict=None
+    if tests is not None:
+        tests_dict=OrderedDict(zip(dates,[None if x==MISSING else x for x in tests.tolist()]))
+    return cases_dict, tests_dict
@@ -0,0 +1,100 @@
+## Date normalisation shared by all country parsers. Dates are carried as integer day ordinals (see `date.toordinal`) and only formatted at render time
+from datetime import date, datetime
+import numpy as np
+from loguru import logger
+
+ISO = 'iso'                                        # 'YYYY-MM-DD' optionally followed by a time e.g. '2020-03-01T00:00:00' or '2020/03/01 00:00:00+00'
+EPOCH_ORDINAL = date(1970,1,1).toordinal()         # day ordinal of numpy's datetime64 epoch
+WEEKDAYS = np.array(['Monday','Tuesday','Wednesday','Thursday','Friday','Saturday','Sunday'])
+
+_ordinal_memo = {}
+
+def to_ordinal(raw_date,date_format=ISO):
+    """
+    Converts a single raw date string to a day ordinal. Every distinct string is only parsed once
+
+    Parameters
+    ----------
+    raw_date : str
+        The date as published by the source
+    date_format : str
+        Optional. Defaults to ISO. Either ISO or a strptime format e.g. '%d.%m.%Y %H:%M:%S'
+
+    Returns
+    -------
+    int
+        The day ordinal
+    """
+    key=(date_format,raw_date)
+    day=_ordinal_memo.get(key)
+    if day is None:
+        if date_format==ISO:
+            day=date.fromisoformat(raw_date[:10].replace('/','-')).toordinal()
+        else:
+            day=datetime.strptime(raw_date,date_format).toordinal()
+        _ordinal_memo[key]=day
+    return day
+
+def to_ordinals(raw_dates,date_format=ISO):
+    """
+    Converts a whole column of raw date strings to day ordinals. Only the distinct values are parsed;
+    ISO dates are parsed in bulk by numpy
+
+    Parameters
+    ----------
+    raw_dates : list
+        A list (or array) of date strings as published by the source
+    date_format : str
+        Optional. Defaults to ISO. Either ISO or a strptime format e.g. '%d.%m.%Y %H:%M:%S'
+
+    Returns
+    -------
+    np.ndarray
+        An int32 array with the day ordinals
+    """
+    try:
+        if len(raw_dates)==0:
+            return np.zeros(0,dtype=np.int32)
+        distinct,inverse=np.unique(np.asarray(raw_dates,dtype=str),return_inverse=True)
+        if date_format==ISO:
+            days=np.char.replace(distinct.astype('U10'),'/','-').astype('datetime64[D]').astype(np.int64)+EPOCH_ORDINAL
+        else:
+            days=np.array([to_ordinal(raw_date,date_format) for raw_date in distinct.tolist()],dtype=np.int64)
+        return days[inverse.ravel()].astype(np.int32)
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def to_iso(ordinals):
+    """
+    Formats day ordinals as dates in isoformat
+
+    Parameters
+    ----------
+    ordinals : array_like
+        The day ordinals
+
+    Returns
+    -------
+    list
+        A list of strings in isoformat
+    """
+    days=np.asarray(ordinals,dtype=np.int64)-EPOCH_ORDINAL
+    return days.astype('datetime64[D]').astype(str).tolist()
+
+def to_weekday_names(ordinals):
+    """
+    Returns the english name of the weekday for each day ordinal
+
+    Parameters
+    ----------
+    ordinals : array_like
+        The day ordinals
+
+    Returns
+    -------
+    list
+        A list of weekday names e.g. 'Saturday'
+    """
+    return WEEKDAYS[(np.asarray(ordinals,dtype=np.int64)+6)%7].tolist()
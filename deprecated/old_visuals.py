@@ -30,15 +30,15 @@ class old_visuals(visuals):
     
     def plot_timeline(self,smooth_obj,country,full_html=True):
         try:
-            self.headers = smooth_obj.headers
-            date_list=[datetime.strptime(x, "%Y-%m-%d").date() for x in smooth_obj.data[0]]
+            self.headers = smooth_obj.table.names
+            date_list=[date.fromordinal(x) for x in smooth_obj.table['Date'].tolist()] # the dates are carried as day ordinals
             fig = make_subplots(rows=2, cols=1,
                         specs=[[{"type": "scatter"}], [{"type": "table"}]]
                     )
 
-            for i in range(1,len(smooth_obj.headers)):
-                fig.add_trace(go.Scatter(x=date_list, y=smooth_obj.data[i],
-                                name=smooth_obj.headers[i]),row=1,col=1)
+            for i in range(1,len(smooth_obj.table.names)):
+                fig.add_trace(go.Scatter(x=date_list, y=smooth_obj.table.columns[i],
+                                name=smooth_obj.table.names[i]),row=1,col=1)
                 # fig.add_trace(go.Scatter(x=date_list, y=smooth_obj.data[i],
                 #                 name=smooth_obj.headers[i]),row=2,col=1)
 
@@ -67,9 +67,9 @@ class old_visuals(visuals):
             self.fig=go.Figure()
             h_fill_color=self.colorHeaderBG
             h_font_color=self.colorHeaderFont
-            self.add_table(attr.headers7,smooth_obj.data7,self.colorCellFont,h_fill_color,h_font_color,visibility=True)
-            self.add_table(attr.headers14,smooth_obj.data14, self.colorCellFont,h_fill_color,h_font_color)
-            self.add_table(attr.headers,smooth_obj.data,self.colorCellFont,h_fill_color,h_font_color)
+            self.add_table(attr.headers7,smooth_obj.table7.columns,self.colorCellFont,h_fill_color,h_font_color,visibility=True)
+            self.add_table(attr.headers14,smooth_obj.table14.columns, self.colorCellFont,h_fill_color,h_font_color)
+            self.add_table(attr.headers,smooth_obj.table.columns,self.colorCellFont,h_fill_color,h_font_color)
             smooth_dropdowns = add_update_menus(attr.dropdown1,attr.dropdown2,option3_dict=attr.dropdown3)
             self.update_layout(smooth_dropdowns,f"<b> Corona statistics for {self.country_name} </b>")
             self.fig.write_html(f'plot_output/smoothened_example_{country}.html',full_html=full_html)
@@ -81,9 +81,9 @@ class old_visuals(visuals):
         
     class smoothened():
         def __init__(self,data_obj):
-            self.headers7 = [f'<b>{x} </b>' for x in data_obj.headers7]
-            self.headers14 = [f'<b>{x} </b>' for x in data_obj.headers14]
-            self.headers = [f'<b>{x} </b>' for x in data_obj.headers]
+            self.headers7 = [f'<b>{x} </b>' for x in data_obj.table7.names]
+            self.headers14 = [f'<b>{x} </b>' for x in data_obj.table14.names]
+            self.headers = [f'<b>{x} </b>' for x in data_obj.table.names]
             self.dropdown1 = {'label':'7 day Calculations','visibility': [True,False,False]}
             self.dropdown2 = {'label':'14 day Calculations','visibility': [False,True,False]}
             self.dropdown3 = {'label':'All Calculations','visibility': [False,False,True]}
@@ -1,29 +1,52 @@
-from logging import raiseExceptions
-import requests
 import csv
+import io
 import json
 from loguru import logger
 import sys
-from collections import OrderedDict
-from datetime import datetime, timedelta
+from datetime import date, datetime
+import time
 import pathlib
-import pickle
-import urllib3
-import ijson
-from urllib.request import urlopen 
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
+import numpy as np
+import http_cache
+import spooled_download
+from http_session import get_session, TIMEOUT
+from timeseries_store import timeseries_store
+from columnar_cache import columns_to_dicts
+from date_normalisation import ISO, to_ordinals
+from country_settings import get_attributes
+from sources import available_sources, get_data_preparation
 
 
 logger.add(sys.stderr, format="{time} {level} {message}", filter="my_module", level="INFO")
 logger.add(sys.stderr, format="{time} {level} {message}", filter="my_module", level="ERROR")
 
-def cache_dict(obj, name ):
-    with open('download_cache/'+ name + '.pkl', 'wb') as f:
-        pickle.dump(obj, f, pickle.HIGHEST_PROTOCOL)
+IJSON_BACKENDS = ['yajl2_c','yajl2_cffi','yajl2','python'] # from fastest to slowest
+_ijson_backend = None
+IJSON_BUFFER_SIZE = 1<<18 # bytes read from the response per parser call
 
-def load_cached_dict(name ):
-    with open('download_cache/' + name + '.pkl', 'rb') as f:
-        return pickle.load(f)
+def get_ijson_backend():
+    """
+    Returns the fastest ijson backend which is installed. The C backend (yajl2_c) is usually an order of magnitude faster than the pure python backend
 
+    Returns
+    -------
+    module
+        An ijson backend module providing e.g. `items` and `kvitems`
+    """
+    global _ijson_backend
+    if _ijson_backend is None:
+        import ijson # only the json sources need it
+        for name in IJSON_BACKENDS:
+            try:
+                _ijson_backend=ijson.get_backend(name)
+                logger.info(f'Using the ijson backend {name}')
+                break
+            except ImportError:
+                continue
+    return _ijson_backend
 
 def verify_cache_existence(country):
     """
@@ -40,7 +63,7 @@ def verify_cache_existence(country):
         A boolean. True if the current data is up to date, False otherwise
     """
     try:
-        fname = pathlib.Path(f'download_cache/cases_{country}.pkl')
+        fname = pathlib.Path(f'download_cache/store_{country}.csv')
         if fname.exists():
             mtime = datetime.fromtimestamp(fname.stat().st_mtime)
             return datetime.today().date()<=mtime.date()
@@ -54,9 +77,10 @@ def verify_cache_existence(country):
 
 ## create separate download covid data functions for LV and DE
 
-def download_covid_data(country_attributes,country,reversed_dates=True,use_cache=False):
+def download_covid_data(country_attributes,country,reversed_dates=True,use_cache=False,return_changed_dates=False,as_columns=False):
     """
-    Loads covid data from cache if it already exists and otherwise triggers the download and the data cleaning (or standardisation) process
+    Loads covid data from cache if it already exists and otherwise triggers the download and the data cleaning (or standardisation) process.
+    With the cache the data is kept in a per-country time series store and only the days after `timeseries_store.since` are parsed and merged.
 
     Parameters
     ----------
@@ -66,6 +90,14 @@ def download_covid_data(country_attributes,country,reversed_dates=True,use_cache
         A two letter color code for a country e.g. 'de' for Germany
     reversed_dates : bool
         A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+    use_cache : bool
+        Optional. Defaults to False. If True the data is merged into (and loaded from) the time series store in `download_cache`
+    return_changed_dates : bool
+        Optional. Defaults to False. If True a sorted array with the day ordinals which were added or revised by this call is returned as last value
+    as_columns : bool
+        Optional. Defaults to False. If True the data is returned as a tuple of numpy columns (day ordinals, cases, tests) instead of two dictionaries.
+        With the cache these columns are memory mapped views of the store's snapshot as long as its log is empty; otherwise the snapshot is copied
+        once (see `timeseries_store`)
 
 
     Returns
@@ -75,43 +107,159 @@ def download_covid_data(country_attributes,country,reversed_dates=True,use_cache
     """
 
     try:
-        if use_cache:
-            load_from_cache=verify_cache_existence(country)
+        url=country_attributes.url
+        response=None
+        store=timeseries_store(country,country_attributes.contains_tests,country_attributes.revision_days) if use_cache else None
+        if use_cache and store.exists():
+            if http_cache.has_validators(url):
+                # ask the server if anything changed since the store was written. A 304 costs one round-trip and no parsing
+                response=request_source(country_attributes,url,stream=True,conditional=True)
+                load_from_cache=response is not None and response.status_code==304
+            else:
+                # the server did not send an ETag or Last-Modified: fall back to the daily cache
+                load_from_cache=verify_cache_existence(country)
         else:
             load_from_cache=False
 
         if load_from_cache:
-            cases_dict=load_cached_dict(f'cases_{country}')
-            tests_dict=load_cached_dict(f'tests_{country}') if country_attributes.contains_tests else None       
-            return cases_dict, tests_dict
+            if response is not None:
+                response.close()
+                logger.info(f'Source for {country} not modified. Loading data from cache')
+            changed_dates=np.zeros(0,dtype=np.int32)
         else:
-            if country=='de':
-                cases_dict=data_preparation_de(country_attributes,reversed_dates=reversed_dates)
-                tests_dict=None
-            elif country=='fr':
-                cases_dict, tests_dict=data_preparation_fr(country_attributes,reversed_dates=reversed_dates)
-            elif country=='at':
-                cases_dict=data_preparation_at(country_attributes,reversed_dates=reversed_dates)
-                tests_dict=None
-            elif country=='be':
-                cases_dict, tests_dict=data_preparation_be(country_attributes,reversed_dates=reversed_dates)
-            elif country=='lv':
-                cases_dict, tests_dict=data_preparation_lv(country_attributes,reversed_dates=reversed_dates)
-            else:
-                logger.error(f'No data preparation method for country {country} available')
-                
-            # caching the data and then returning it
+            since=None
             if use_cache:
-                cache_dict(cases_dict,f'cases_{country}')
-                cache_dict(tests_dict,f'tests_{country}') if country_attributes.contains_tests else None
-            return cases_dict, tests_dict
+                since=store.since()
+                if response is None:
+                    response=request_source(country_attributes,url,stream=True)
+
+            data_preparation=get_data_preparation(country)
+            if data_preparation is None:
+                raise ValueError(f'No data preparation method for country {country} available')
+            columns=data_preparation(country_attributes,reversed_dates=reversed_dates,response=response,since=since)
+
+            # merging the new days into the store and returning the complete series
+            if use_cache:
+                changed_dates=store.merge(*columns)
+                http_cache.store_validators(url,response) # only now the validators point to a complete store
+            else:
+                changed_dates=np.sort(columns[0])
+
+        if use_cache:
+            columns=store.to_columns(reversed_dates)
+        result=columns if as_columns else columns_to_dicts(*columns)
+
+        if return_changed_dates:
+            return (*result, changed_dates)
+        return result
+
+
+    except Exception as e:
+        logger.error(e)
+        raise
 
+def download_all_covid_data(countries,reversed_dates=True,use_cache=False,as_columns=False,return_changed_dates=False,max_workers=4,max_per_host=2):
+    """
+    Downloads and prepares the data of several countries concurrently. Every country is handled by its own worker thread,
+    so each parser consumes its body while it streams in and does not wait for the other downloads
+
+    Parameters
+    ----------
+    countries : list
+        A list of two letter country codes e.g. ['de','fr']
+    reversed_dates : bool
+        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+    use_cache : bool
+        Optional. Defaults to False. See `download_covid_data`
+    as_columns : bool
+        Optional. Defaults to False. See `download_covid_data`
+    return_changed_dates : bool
+        Optional. Defaults to False. See `download_covid_data`
+    max_workers : int
+        Optional. Defaults to 4. The maximum number of requests in flight
+    max_per_host : int
+        Optional. Defaults to 2. The maximum number of concurrent requests to the same host
+
+    Returns
+    -------
+    dict
+        A dictionary with the country code as key and the tuple of cases and tests dictionary (or the columns) as value. The value is None if the download failed
+        or no source is registered for the country
+    dict
+        A dictionary with the country code as key and the country attributes as value. Unknown countries are left out
+    """
+    try:
+        # an unknown country code is skipped, the other countries are still downloaded
+        known=set(available_sources())
+        unknown=[country for country in countries if country not in known]
+        if unknown:
+            logger.error(f'No data source registered for {", ".join(unknown)}. Available are: {", ".join(sorted(known))}')
+        countries=[country for country in countries if country in known]
+
+        attributes={country:get_attributes(country) for country in countries}
+        host_limits={}
+        for country in countries:
+            host=urlparse(attributes[country].url).netloc
+            if host not in host_limits:
+                host_limits[host]=threading.BoundedSemaphore(max_per_host)
+
+        def download_country(country):
+            with host_limits[urlparse(attributes[country].url).netloc]:
+                start_time=time.time()
+                result=download_covid_data(attributes[country],country,reversed_dates=reversed_dates,use_cache=use_cache,return_changed_dates=return_changed_dates,as_columns=as_columns)
+                logger.info(f'Extract: {country} done in --- {time.time()-start_time:.2f} seconds ---')
+                return result
+
+        results={country:None for country in unknown}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures={executor.submit(download_country,country):country for country in countries}
+            for future in as_completed(futures):
+                country=futures[future]
+                try:
+                    results[country]=future.result()
+                except Exception as e:
+                    logger.error(f'Download for {country} failed: {e}')
+                    results[country]=None
+
+        return results, attributes
 
     except Exception as e:
         logger.error(e)
         raise
 
-def retrieve_data(country_attributes,url):
+def request_source(country_attributes,url,stream=False,conditional=False):
+    """
+    Sends the GET request for a country resource
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    url : str
+        A string containing the url
+    stream : bool
+        Optional. Defaults to False. If True the body is not downloaded before it is read
+    conditional : bool
+        Optional. Defaults to False. If True the stored ETag/Last-Modified validators are sent and the server may answer with 304 Not Modified
+
+    Returns
+    -------
+    requests.Response
+        The response object
+    """
+    try:
+        # the session reuses pooled connections, retries with backoff and applies the TLS settings of the source (see `ssl_ciphers`)
+        session=get_session(country_attributes)
+        headers=http_cache.conditional_headers(url) if conditional else {}
+        if country_attributes.spool_download:
+            headers['Accept-Encoding']=spooled_download.ACCEPT_ENCODING # the spooled body is decoded locally (see spooled_download.py)
+        return session.get(url,stream=stream,headers=headers,timeout=TIMEOUT)
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def retrieve_data(country_attributes,url,stream=False,response=None):
     """
     Downloads covid data from a url and returns a status code if the download fails.
 
@@ -121,23 +269,30 @@ def retrieve_data(country_attributes,url):
         A dictionary containing country attributes
     url : str
         A string containing the url. This is used to make the function more generic
+    stream : bool
+        Optional. Defaults to False. If True the body is read incrementally: csv rows or the json items below `json_items` (see country_settings.py) are returned lazily as a generator
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
 
 
 
     Returns
     -------
     ? : ? 
-        A list if a csv is downloaded and a dictionary if a json is downloaded
+        A list if a csv is downloaded and a dictionary if a json is downloaded. A generator of rows or items if stream is True
     """
     try: 
-         ## lowing the ssl secure level for Austria - #facepalm. Austrian server apparently uses SSL security level 1 while others use level 2
-        if country_attributes.country_name=="Austria":       
-            requests.packages.urllib3.util.ssl_.DEFAULT_CIPHERS = 'ALL:@SECLEVEL=1'
-                
-        response = requests.get(url)
+        if response is None:
+            response = request_source(country_attributes,url,stream=stream)
         if response.status_code==200:
-            if country_attributes.csv:
+            if country_attributes.csv and stream:
+                return stream_csv(response,country_attributes.csv_separator,country_attributes.csv_encoding)
+            elif country_attributes.csv:
                 return load_csv(response.content,country_attributes.csv_separator,country_attributes.csv_encoding)
+            elif stream and country_attributes.spool_download:
+                return stream_spooled_json(country_attributes,url,response,country_attributes.json_items)
+            elif stream:
+                return stream_json(response,country_attributes.json_items)
             else:
                 return json.loads(response.content)
         else:
@@ -175,222 +330,146 @@ def load_csv(content,sep,encoding):
     except Exception as e:
         logger.error(e)
 
-def data_preparation_de(country_attributes,reversed_dates=True):
+def stream_csv(response,sep,encoding):
     """
-    Creates an sorted dictionary of dates, new cases and tests for the German Covid-19 data
+    Reads the response body incrementally and yields one parsed csv row at a time. Only a small read buffer is held in memory, regardless of the file size
 
-    Parameters
-    ----------
-    country_attributes : dict
-        A dictionary containing country attributes
-    reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+    Parameter
+    ---------
+    response : requests.Response
+        A response which was requested with stream=True
+    sep : str
+        The csv separator
+    encoding : str
+        The csv encoding
 
-    Returns
-    -------
-    dict
-        A dictionary of lists with the keys Date, `New Cases` and Tests (if there is any test data).
-    """
+    Yields
+    ------
+    list : list
+        A list containing the fields of one row of the csv
+    """ 
     try:
-        f=urlopen(country_attributes.url)
-        covid_observations=ijson.kvitems(f, 'features.item')
-        items = (v for k, v in covid_observations if k == 'properties')
-        #cases = (v for k, v in single_covid_observation if k == 'AnzahlFall')
-        day_dict = {}
-        for item in items:
-            current_date=item['Meldedatum'].split('T')[0].replace('/','-')
-            if current_date not in day_dict:
-                day_dict[current_date]=item['AnzahlFall']
-            else:
-                day_dict[current_date]+=item['AnzahlFall']
-
-
-        day_dict_sorted=OrderedDict()
-        for key in sorted(day_dict.keys(),reverse=reversed_dates):
-            day_dict_sorted[key]=day_dict[key]
-
-        return day_dict_sorted
+        response.raw.decode_content=True # transparently inflate gzip/deflate transfer encodings
+        response.raw.auto_close=False    # otherwise urllib3 closes the body at EOF before the text wrapper has finished reading
+        text_stream=io.TextIOWrapper(response.raw,encoding=encoding,newline='')
+        for row in csv.reader(text_stream,delimiter=sep):
+            yield row
 
     except Exception as e:
         logger.error(e)
+        raise
 
-def data_preparation_fr(country_attributes,reversed_dates=True):
-    """
-    Creates an sorted dictionary of dates, new cases and tests for the French Covid-19 data
+    finally:
+        response.close()
 
-    Parameters
-    ----------
-    country_attributes : dict
-        A dictionary containing country attributes
-    reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
-
-    Returns
-    -------
-    dict
-        A dictionary of lists with the keys Date, `New Cases` and Tests (if there is any test data).
+def stream_json(response,prefix):
     """
-    try:
-        response_list= retrieve_data(country_attributes,country_attributes.url)
-        column_names=response_list[0]
-        date_ix=column_names.index('date')
-        cases_ix=column_names.index('pos')
-        rate_ix=column_names.index('tx_pos')
-        cases_dict={}
-        tests_dict={}
-
-        my_iterator=range(1,len(response_list))
-        if reversed_dates:
-            my_iterator=reversed(my_iterator)
-
-        for i in my_iterator:
-            if response_list[i][cases_ix] is None or len(response_list[i][rate_ix])==0:
-                next
-            else:
-                cases=int(response_list[i][cases_ix])
-                rate=float(response_list[i][rate_ix])/100
-                date=response_list[i][date_ix]
-                estimated_tests=int(round(cases/rate))
-                cases_dict[date]=cases
-                tests_dict[date]=estimated_tests
+    Parses the response body incrementally and yields the json objects below a prefix one at a time. 
+    Parsing overlaps with the transfer and only the current object is held in memory
 
-        return cases_dict, tests_dict
+    Parameter
+    ---------
+    response : requests.Response
+        A response which was requested with stream=True
+    prefix : str
+        An ijson prefix e.g. 'item' for the elements of a top level array or 'result.records.item'
+
+    Yields
+    ------
+    dict : dict
+        A dictionary for each json object below the prefix
+    """ 
+    try:
+        response.raw.decode_content=True
+        # use_float avoids creating Decimal objects for non-integer numbers
+        for item in get_ijson_backend().items(response.raw,prefix,use_float=True,buf_size=IJSON_BUFFER_SIZE):
+            yield item
 
     except Exception as e:
         logger.error(e)
+        raise
+
+    finally:
+        response.close()
 
-def data_preparation_at(country_attributes,reversed_dates=True):
+def stream_spooled_json(country_attributes,url,response,prefix):
     """
-    Creates an sorted dictionary of dates, new cases and tests for the Austrian Covid-19 data
+    Downloads the body into a local file first (resuming interrupted transfers, see spooled_download.py) and then parses the file incrementally.
+    The spool file is deleted once all objects were read
 
-    Parameters
-    ----------
+    Parameter
+    ---------
     country_attributes : dict
         A dictionary containing country attributes
-    reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
-
-    Returns
-    -------
-    dict
-        A dictionary of lists with the keys Date, `New Cases` and Tests (if there is any test data).
+    url : str
+        The url of the resource
+    response : requests.Response
+        A response which was requested with stream=True
+    prefix : str
+        An ijson prefix e.g. 'features.item.properties'
+
+    Yields
+    ------
+    dict : dict
+        A dictionary for each json object below the prefix
     """
-    try:       
-        # load the second csv 
-        response_list=retrieve_data(country_attributes,country_attributes.url)
-        column_names=response_list[0]
-        date_ix=0
-        cases_ix=column_names.index('AnzahlFaelle')
-        cases_dict={}
-        # tests_dict2={} #not needed
-        my_iterator=range(1,len(response_list))
-        if reversed_dates:
-            my_iterator=reversed(my_iterator)
-
-        for i in my_iterator:
-            date=datetime.strptime(response_list[i][date_ix],'%d.%m.%Y %H:%M:%S')
-            if response_list[i][1]!="Österreich":
-                next
-            else:
-                date_str=datetime.date(date).isoformat()
-                cases=int(response_list[i][cases_ix])
-                cases_dict[date_str]=cases  
-                
-        return cases_dict
+    try:
+        path,encoding=spooled_download.spool_download(country_attributes,url,response)
+        with spooled_download.open_spooled(path,encoding) as f:
+            for item in get_ijson_backend().items(f,prefix,use_float=True,buf_size=IJSON_BUFFER_SIZE):
+                yield item
+        spooled_download.remove_spooled(url)
 
     except Exception as e:
         logger.error(e)
+        raise
 
-def data_preparation_be(country_attributes,reversed_dates=True):
+def aggregate_to_columns(cases_dict,tests_dict=None,date_format=ISO,reversed_dates=True,since=None):
     """
-    Creates an sorted dictionary of dates, new cases and tests for the Belgian Covid-19 data
+    Converts the per-date aggregates of a parser into sorted columns. The raw date strings are normalised in bulk
 
     Parameters
     ----------
-    country_attributes : dict
-        A dictionary containing country attributes
+    cases_dict : dict
+        A dictionary with the raw date strings of the source as keys and the new cases as values
+    tests_dict : dict
+        Optional. The same for the tests
+    date_format : str
+        Optional. Defaults to ISO. The format of the raw dates, see date_normalisation.py
     reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    since : str
+        Optional. A date in isoformat. Days before this date are dropped
 
     Returns
     -------
-    dict
-        A dictionary of lists with the keys Date, `New Cases` and Tests (if there is any test data).
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if tests_dict is None
     """
-    try:
-        response_dict= retrieve_data(country_attributes,country_attributes.url)       
-        cases_dict={}
-        tests_dict={}
-
-        my_iterator=range(1,len(response_dict))
-        if reversed_dates:
-            my_iterator=reversed(my_iterator)
-
-        for i in my_iterator:
-            current_date=response_dict[i].get('DATE')
-            #if current_date is not None: # there is some none types at the end of the JSON
-            if current_date not in cases_dict:
-                cases_dict[current_date]=response_dict[i]['TESTS_ALL_POS']
-                tests_dict[current_date]=response_dict[i]['TESTS_ALL']
-            else:
-                cases_dict[current_date]+=response_dict[i]['TESTS_ALL_POS'] # Summing up the data
-                tests_dict[current_date]+=response_dict[i]['TESTS_ALL'] # Summing up the data
-
-        reversed_dates=True
-        cases_dict_sorted=OrderedDict()
-        tests_dict_sorted=OrderedDict()
-        for key in sorted(cases_dict.keys(),reverse=reversed_dates):
-            cases_dict_sorted[key]=cases_dict[key]
-            tests_dict_sorted[key]=tests_dict[key]
-                
-        return cases_dict_sorted, tests_dict_sorted
+    raw_dates=list(cases_dict.keys())
+    ordinals=to_ordinals(raw_dates,date_format)
+    cases=np.fromiter(cases_dict.values(),dtype=np.int64,count=len(raw_dates))
+    tests=np.fromiter((tests_dict[raw_date] for raw_date in raw_dates),dtype=np.int64,count=len(raw_dates)) if tests_dict is not None else None
 
-    except Exception as e:
-        logger.error(e)
+    order=np.argsort(ordinals,kind='stable')
+    if since is not None:
+        order=order[ordinals[order]>=date.fromisoformat(since).toordinal()]
+    if reversed_dates:
+        order=order[::-1]
+    return ordinals[order], cases[order], (tests[order] if tests is not None else None)
 
 
 
 
-def data_preparation_lv(country_attributes,reversed_dates=True):
-    """
-    Creates an sorted dictionary of dates, new cases and tests for the Latvian Covid-19 data
 
-    Parameters
-    ----------
-    country_attributes : dict
-        A dictionary containing country attributes
-    reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
-
-    Returns
-    -------
-    dict
-        A dictionary of lists with the keys Date, `New Cases` and Tests (if there is any test data).
-    """
-    try:
-        # this works
-        response_dict= retrieve_data(country_attributes,country_attributes.url)
-        original_list=response_dict.get('result').get('records')
 
-        if reversed_dates:
-            loop_range=range(len(original_list)-1,-1,-1)
-        else:
-            loop_range=range(0,len(original_list))
 
-        cases_dict={}
-        tests_dict={}
-        for i in loop_range:
-            item=original_list[i]
-            current_date=item['Datums'].split('T')[0]
-            new_cases=int(item['ApstiprinataCOVID19InfekcijaSkaits'])
-            new_tests=int(item['TestuSkaits'])
-            cases_dict[current_date]=new_cases
-            tests_dict[current_date]=new_tests       
 
-        return cases_dict, tests_dict
 
-    except Exception as e:
-        logger.error(e)
 
 
 
@@ -0,0 +1,150 @@
+## Persisted history tables (see `transform_enrich.history`). A render only calculates the rows whose windows contain a day which the time series
+## store reports as new or revised; the other rows are taken from the table of the previous render in download_cache/history_<country>.pkl
+import os
+import pathlib
+import pickle
+import numpy as np
+from loguru import logger
+from transform_enrich import history
+
+HISTORY_FOLDER = pathlib.Path('download_cache')
+CACHE_VERSION = 1 # stored with the table, so tables of an older `history_columns` are calculated again
+INPUT_COLUMNS = ['Date','New Cases','Tests administered'] # the daily values a table is calculated from
+
+def history_path(country,folder=HISTORY_FOLDER):
+    return pathlib.Path(folder)/f'history_{country}.pkl'
+
+def load_history(country,folder=HISTORY_FOLDER):
+    """
+    Returns the history of the previous render or None
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    folder : str
+        Optional. The folder of the history files
+
+    Returns
+    -------
+    transform_enrich.history
+        The history with its table. None if there is no (readable) file of this version
+    """
+    path=history_path(country,folder)
+    if not path.exists():
+        return None
+    try:
+        with open(path,'rb') as f:
+            state=pickle.load(f) # the files are written by `store_history` of this module only
+        if state.get('version')!=CACHE_VERSION:
+            return None
+        historical_data=history()
+        for name in ('population','reversed_dates','names','buffers','days','first_ordinal'):
+            setattr(historical_data,name,state[name])
+        historical_data.updated_rows=slice(0,0)
+        historical_data.set_table()
+        return historical_data
+
+    except Exception as e:
+        logger.error(f'Dropping the unreadable history file {path}: {e}')
+        path.unlink(missing_ok=True)
+        return None
+
+def store_history(country,historical_data,folder=HISTORY_FOLDER):
+    """
+    Writes a history for the next render. Only the filled part of the buffers is stored
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    historical_data : transform_enrich.history
+        The history with its table
+    folder : str
+        Optional. The folder of the history files
+    """
+    try:
+        path=history_path(country,folder)
+        path.parent.mkdir(parents=True,exist_ok=True)
+        state=dict(version=CACHE_VERSION,population=historical_data.population,reversed_dates=historical_data.reversed_dates,names=historical_data.names,
+                   buffers=[buffer[:historical_data.days] for buffer in historical_data.buffers],days=historical_data.days,first_ordinal=historical_data.first_ordinal)
+        tmp_path=path.with_suffix('.tmp')
+        with open(tmp_path,'wb') as f:
+            pickle.dump(state,f,protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path,path)
+
+    except Exception as e:
+        logger.error(e) # the file is optional, the next render calculates the whole table
+
+def update_history(country,population,daily_dict,changed_dates,reversed_dates=True,folder=HISTORY_FOLDER):
+    """
+    Calculates the history table of a country. If the previous render left a table, only the days from the first changed date on are calculated
+    (see `history.update_values`). The previous table is only used if its daily values before that date are the ones of `daily_dict`, so a store which
+    was refreshed without a render (e.g. by `--extract-only`) leads to a complete calculation
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    population : int
+        The population of a country
+    daily_dict : dict
+        A dictionary containing the dates (as day ordinals), new cases and optionally the amount of tests (NaN where they are missing) of the whole series
+    changed_dates : np.ndarray
+        The day ordinals which the store reported as new or revised (see `extract_data.download_covid_data`). None if they are not known
+    reversed_dates : bool
+        A boolean which is true if the series is sorted from most current to oldest date. If False it is sorted from oldest to most current date.
+    folder : str
+        Optional. The folder of the history files
+
+    Returns
+    -------
+    history
+        The history with its table. `updated_rows` are the rows which have been calculated
+    """
+    try:
+        historical_data=load_history(country,folder) if changed_dates is not None else None
+        if historical_data is not None and not reusable(historical_data,population,daily_dict,changed_dates,reversed_dates):
+            historical_data=None
+
+        if historical_data is not None:
+            dates=np.asarray(daily_dict['Date'])
+            window=dates>=int(np.min(changed_dates)) if len(changed_dates)>0 else np.zeros(len(dates),dtype=bool)
+            update={name: (np.asarray(values)[window] if values is not None else None) for name,values in daily_dict.items()}
+            if historical_data.update_values(update) is None:
+                historical_data=None
+            else:
+                logger.info(f'Transform: {country} history updated for {int(window.sum())} of {len(dates)} days')
+
+        if historical_data is None:
+            historical_data=history()
+            if historical_data.calculate_values(population,daily_dict,reversed_dates=reversed_dates) is None:
+                raise ValueError(f'The history of {country} could not be calculated')
+
+        store_history(country,historical_data,folder)
+        return historical_data
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def reusable(historical_data,population,daily_dict,changed_dates,reversed_dates):
+    """
+    Checks that a stored history was calculated from the same series as `daily_dict`, except for the days from the first changed date on.
+    Comparing the daily values is much cheaper than calculating the rolling windows again
+    """
+    if historical_data.population!=population or historical_data.reversed_dates!=reversed_dates or historical_data.days==0:
+        return False
+    if ('Tests administered' in historical_data.names)!=(daily_dict.get('Tests') is not None):
+        return False
+    columns=[np.asarray(daily_dict[key]) for key in ('Date','New Cases','Tests') if daily_dict.get(key) is not None]
+    if reversed_dates:
+        columns=[column[::-1] for column in columns]
+    first=int(np.min(changed_dates)) if len(changed_dates)>0 else None
+    kept=len(columns[0]) if first is None else int(np.searchsorted(columns[0],first))
+    buffers=[historical_data.buffers[historical_data.table.index[name]] for name in INPUT_COLUMNS if name in historical_data.table]
+    if len(columns[0])<historical_data.days or kept>historical_data.days:
+        return False # days were removed, or days before the changed dates are missing in the stored table
+    if first is None and len(columns[0])!=historical_data.days:
+        return False
+    return all(np.array_equal(buffer[:kept],column[:kept],equal_nan=True) for buffer,column in zip(buffers,columns))
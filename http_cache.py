@@ -0,0 +1,97 @@
+## Conditional GET support: remembers the HTTP validators (ETag/Last-Modified) of every downloaded url
+import json
+import pathlib
+import threading
+from loguru import logger
+
+VALIDATOR_FILE = pathlib.Path('download_cache/validators.json')
+VALIDATOR_LOCK = threading.Lock() # several countries might be downloaded concurrently
+
+def load_validators():
+    """
+    Loads all stored validators
+
+    Returns
+    -------
+    dict
+        A dictionary with the url as key and a dictionary with the keys `etag` and `last_modified` as value
+    """
+    try:
+        if VALIDATOR_FILE.exists():
+            with open(VALIDATOR_FILE, 'r') as f:
+                return json.load(f)
+        else:
+            return {}
+
+    except Exception as e:
+        logger.error(e)
+        return {}
+
+def has_validators(url):
+    """
+    Checks if a validator was stored for the url. Some servers do not send any, in that case a conditional request is pointless
+
+    Parameters
+    ----------
+    url : str
+        The url of the resource
+
+    Returns
+    -------
+    bool
+        True if an ETag or a Last-Modified date is known for this url
+    """
+    return url in load_validators()
+
+def conditional_headers(url):
+    """
+    Creates the request headers which make a GET request conditional
+
+    Parameters
+    ----------
+    url : str
+        The url of the resource
+
+    Returns
+    -------
+    dict
+        A dictionary with `If-None-Match` and/or `If-Modified-Since` headers. Empty if nothing is known about the url
+    """
+    validators=load_validators().get(url,{})
+    headers={}
+    if validators.get('etag') is not None:
+        headers['If-None-Match']=validators['etag']
+    if validators.get('last_modified') is not None:
+        headers['If-Modified-Since']=validators['last_modified']
+    return headers
+
+def store_validators(url,response):
+    """
+    Stores the validators of a successful response. Call this only after the response was parsed and cached,
+    otherwise a later 304 might point to a cache which does not exist
+
+    Parameters
+    ----------
+    url : str
+        The url of the resource
+    response : requests.Response
+        The response of the (conditional) GET request
+    """
+    try:
+        etag=response.headers.get('ETag')
+        last_modified=response.headers.get('Last-Modified')
+        with VALIDATOR_LOCK:
+            validators=load_validators()
+            if etag is None and last_modified is None:
+                validators.pop(url,None)
+            else:
+                validators[url]=dict(etag=etag,last_modified=last_modified)
+
+            VALIDATOR_FILE.parent.mkdir(exist_ok=True)
+            tmp_file=VALIDATOR_FILE.with_suffix('.tmp')
+            with open(tmp_file, 'w') as f:
+                json.dump(validators, f, indent=2)
+            tmp_file.replace(VALIDATOR_FILE)
+
+    except Exception as e:
+        logger.error(e)
@@ -0,0 +1,101 @@
+## Shared HTTP session: connection pooling, retries with backoff, timeouts and TLS settings per source
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.ssl_ import create_urllib3_context
+from loguru import logger
+
+TIMEOUT = (10, 120)                             # (connect, read) in seconds. The read timeout applies between two chunks, not to the whole transfer
+RETRY_SETTINGS = dict(
+    total = 5,
+    backoff_factor = 1,                         # waits 0s, 2s, 4s, 8s, ... between the attempts
+    status_forcelist = [429, 500, 502, 503, 504],
+    allowed_methods = ['GET', 'HEAD'],
+    respect_retry_after_header = True
+)
+POOL_SETTINGS = dict(pool_connections=10, pool_maxsize=10)
+
+_session = None
+_mounted_prefixes = set()
+_session_lock = threading.Lock()
+
+class source_adapter(HTTPAdapter):
+    def __init__(self, ciphers=None, **kwargs):
+        """
+        A HTTPAdapter which only applies its TLS settings to the urls it is mounted on.
+        That way e.g. the lowered security level of one source does not leak into the downloads of all other sources
+
+        Parameters
+        ----------
+        ciphers : str
+            Optional. An OpenSSL cipher string e.g. 'ALL:@SECLEVEL=1'. If None the default context is used
+        **kwargs
+            further arguments for HTTPAdapter e.g. max_retries or pool_maxsize
+        """
+        self.ciphers = ciphers
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.ciphers is not None:
+            kwargs['ssl_context'] = create_urllib3_context(ciphers=self.ciphers)
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        if self.ciphers is not None:
+            kwargs['ssl_context'] = create_urllib3_context(ciphers=self.ciphers)
+        return super().proxy_manager_for(*args, **kwargs)
+
+def create_adapter(ciphers=None):
+    """
+    Creates an adapter with the pool and retry settings of this module
+
+    Parameters
+    ----------
+    ciphers : str
+        Optional. An OpenSSL cipher string for this source
+
+    Returns
+    -------
+    source_adapter
+        The adapter
+    """
+    return source_adapter(ciphers=ciphers, max_retries=Retry(**RETRY_SETTINGS), **POOL_SETTINGS)
+
+def get_session(country_attributes=None):
+    """
+    Returns the process wide session. The session keeps the connections alive, so several requests
+    to the same host (e.g. a conditional GET followed by the download) reuse one TLS connection.
+    If a source needs its own TLS settings an adapter is mounted for the host of that source
+
+    Parameters
+    ----------
+    country_attributes : dict
+        Optional. A dictionary containing country attributes. Used to mount the adapter of the source
+
+    Returns
+    -------
+    requests.Session
+        The shared session
+    """
+    global _session
+    try:
+        with _session_lock:
+            if _session is None:
+                _session = requests.Session()
+                _session.mount('https://', create_adapter())
+                _session.mount('http://', create_adapter())
+
+            if country_attributes is not None and country_attributes.ssl_ciphers is not None:
+                url = urlparse(country_attributes.url)
+                prefix = f'{url.scheme}://{url.netloc}/'
+                if prefix not in _mounted_prefixes:
+                    _session.mount(prefix, create_adapter(ciphers=country_attributes.ssl_ciphers))
+                    _mounted_prefixes.add(prefix)
+
+            return _session
+
+    except Exception as e:
+        logger.error(e)
+        raise
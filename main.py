@@ -2,79 +2,97 @@ import sys
 from loguru import logger
 import time
 
-from country_settings import get_attributes
-from extract_data import download_covid_data
-from transform_enrich import history, simulate
+from country_settings import country_codes
 
-from visuals_plotly import visuals
-from visuals_tabulator import historical_table
+# the stages are imported when they run (numpy, ijson, plotly and sass are slow to import), see benchmarks/startup_time.py
 
 logger.add(sys.stderr, format="{time} {level} {message}", filter="main", level="INFO")
 logger.add(sys.stderr, format="{time} {level} {message}", filter="main", level="ERROR")
 
 def main():
     try:
-        # 0.1 Define Country 
-        if len(sys.argv)==1:
-            country='fr'    
+        # 0.1 Define Countries: `python main.py de fr` or `python main.py all`
+        # `--extract-only` only refreshes the time series stores in download_cache e.g. for a cron job
+        # `--renewal` simulates the future with the renewal equation instead of a linear trend
+        args=[arg for arg in sys.argv[1:] if not arg.startswith('--')]
+        extract_only='--extract-only' in sys.argv[1:]
+        renewal='--renewal' in sys.argv[1:]
+        if len(args)==0:
+            countries=['fr']
+        elif args[0]=='all':
+            countries=country_codes
         else: 
-            country=sys.argv[1]
-            
-            # Current choices 'de' or 'lv'
-            # data=data(country)
-            # data.load(country)
+            countries=args
 
         ## 1.1. Load data from the API
-        # former prepare self=data
-
-        # 1.1.1 Assign downloaded data to dictionaries
+        # all countries are downloaded concurrently, so a full refresh takes about as long as the slowest source
+        # the data is merged into the time series stores, so a render after a cron refresh only asks the servers for changes
         start_time = time.time()
-        attr = get_attributes(country)
-        cases_dict, tests_dict=download_covid_data(attr,country)
-        daily={'Date': list(cases_dict.keys()),'New Cases': list(cases_dict.values())}
-        daily['Tests']=list(tests_dict.values()) if attr.contains_tests else None
-
+        from extract_data import download_all_covid_data
+        results, attributes=download_all_covid_data(countries,use_cache=True,as_columns=True,return_changed_dates=True)
         logger.info("Extract: Data extracted in --- %s seconds ---" % (time.time() - start_time))
+        if extract_only:
+            return
+
+        for country in countries:
+            if results[country] is None:
+                logger.error(f'No data for {country}. Skipping the output')
+                continue
+            ordinals, cases, tests, changed_dates=results[country]
+            create_output(country,attributes[country],ordinals,cases,tests,changed_dates,start_time,renewal)
+
+    except Exception as e:
+        logger.error(e)
+        raise 
+
+def create_output(country,attr,ordinals,cases,tests,changed_dates,start_time,renewal=False):
+    try:
+        logger.info(f'Extract: {len(changed_dates)} new or revised days for {country}')
+        import numpy as np
+        from columnar_cache import MISSING
+        from transform_enrich import simulate
+        from history_cache import update_history
+        # 1.1.1 Assign downloaded columns to dictionaries. The dates stay day ordinals and are only formatted when the html is written
+        daily={'Date': ordinals,'New Cases': cases}
+        daily['Tests']=np.where(tests==MISSING,np.nan,tests) if attr.contains_tests else None
 
         ## 1.2. Enrich data from the API
 
-        # 1.2.2 Create dictionaries with historic data
+        # 1.2.2 Create dictionaries with historic data. Only the days from the first new or revised date on are calculated, the other rows are
+        # taken from the table of the previous render (see history_cache.py)
         from_young_to_old_dates=True
-        historical_data=history()
-        history.calculate_values(historical_data,attr.population,daily,reversed_dates=from_young_to_old_dates)
-        logger.info("Transform: Created historical calculations  --- %s seconds ---" % (time.time() - start_time))
-
-        if from_young_to_old_dates:
-            new_cases_avg=historical_data.data[historical_data.headers.index('7d mean')][0]
-            new_cases_14d_avg=historical_data.data[historical_data.headers.index('14d mean')][0]
-        else:
-            mean7d=historical_data.data[historical_data.headers.index('7d mean')]
-            mean14d=historical_data.data[historical_data.headers.index('14d mean')]
-            new_cases_avg=mean7d[len(mean7d)-1]
-            new_cases_14d_avg=mean14d[len(mean14d)-1]
+        historical_data=update_history(country,attr.population,daily,changed_dates,reversed_dates=from_young_to_old_dates)
+        logger.info(f"Transform: Created historical calculations for {country} --- %s seconds ---" % (time.time() - start_time))
+
+        newest=0 if from_young_to_old_dates else -1
+        new_cases_avg=historical_data.table['7d mean'][newest]
+        new_cases_14d_avg=historical_data.table['14d mean'][newest]
 
         # 1.2.3 Create dictionaries with simulated data (simulating the future)
         R_range=[0.7,0.75,0.8,0.85,0.9,0.95,1.05,1.1,1.15,1.2]
         thresholds=[3,7,10,20,50,100,200,400,600,800,1000]
         simulated=simulate(new_cases_avg,attr.population,R_range,thresholds,new_cases_assumed14=new_cases_14d_avg)
-        simulated.simulate_new_cases()
-        simulated.create_th_values()
-        logger.info("Transform: Data is prepared - starting to write to html --- %s seconds ---" % (time.time() - start_time))
+        # the scenarios are reused if the same inputs were simulated today (in memory or in download_cache/scenarios)
+        from scenario_cache import get_cache
+        get_cache().simulate(simulated,renewal=renewal)
+        logger.info(f"Transform: Data for {country} is prepared - starting to write to html --- %s seconds ---" % (time.time() - start_time))
 
 
         ## 1.3. Create tables
+        from visuals_plotly import visuals
+        from visuals_tabulator import historical_table
+
         # 1.3.1 Create historical table
         historical_table.compile_css(attr.color_sizes,country)
         history_dict_list=historical_table.create_dicts(historical_data)
-        history_columns=historical_table.create_history_columns(historical_data.headers7)
+        history_columns=historical_table.create_history_columns(historical_data.table7.names)
         historical_table.write_tabulator(history_dict_list,history_columns,country)
 
         # 1.3.2 create threshold and other data
         plots_obj=visuals(attr)
-        historical_data.data
         plots_obj.plot_threshold(simulated,country,full_html=False)
 
-        logger.info("Done writing html-files --- %s seconds ---" % (time.time() - start_time))
+        logger.info(f"Done writing html-files for {country} --- %s seconds ---" % (time.time() - start_time))
 
         # 2. Epilog: How to use deprecated code
 
@@ -0,0 +1,210 @@
+## Regional time series (e.g. Bundesland or province) stored as (region x day) matrices. Parsers fill a builder in one pass over the source.
+## The matrices are float64 (exact for counts below 2**53), so a region and day without data can be NaN instead of a zero
+from array import array
+import numpy as np
+from loguru import logger
+from date_normalisation import ISO, to_ordinal, to_ordinals
+
+class regional_builder():
+    def __init__(self,contains_tests=False,date_format=ISO,since=None,national=None):
+        """
+        Collects the observations of a source row by row. Regions are dictionary encoded and every distinct raw date string is converted once, so only integers are buffered
+
+        Parameters
+        ----------
+        contains_tests : bool
+            If True a test count is collected next to the cases
+        date_format : str
+            Optional. Defaults to ISO. The format of the raw dates, see `date_normalisation.to_ordinal`
+        since : str
+            Optional. A date in isoformat. Observations before this date are dropped while the source streams in
+        national : str
+            Optional. The name under which the source publishes the national total next to its regions e.g. 'Österreich'. It is not a region of the matrix,
+            but kept as `regional_matrix.national`
+        """
+        self.contains_tests=contains_tests
+        self.national=national
+        self.date_format=date_format
+        self.since_ordinal=to_ordinal(since) if since is not None else None
+        self.region_codes={}
+        self.date_ordinals={}  # raw date -> day ordinal, None if the day is before `since`
+        self.populations={}
+        self.regions=array('q')
+        self.dates=array('q')
+        self.cases=array('q')
+        self.tests=array('q')
+
+    def add(self,region,raw_date,cases,tests=None,population=None):
+        """
+        Adds one observation. Several observations of the same region and day are summed up
+
+        Parameters
+        ----------
+        region : str
+            The name of the region
+        raw_date : str
+            The date as published by the source
+        cases : int
+            The new cases
+        tests : int
+            Optional. The tests
+        population : int
+            Optional. The population of the region, if the source publishes it
+        """
+        if population is not None:
+            self.populations[region]=population
+        if raw_date in self.date_ordinals:
+            day=self.date_ordinals[raw_date]
+        else:
+            day=to_ordinal(raw_date,self.date_format)
+            if self.since_ordinal is not None and day<self.since_ordinal:
+                day=None
+            self.date_ordinals[raw_date]=day
+        if day is None:
+            return
+        region_code=self.region_codes.get(region)
+        if region_code is None:
+            region_code=self.region_codes[region]=len(self.region_codes)
+        self.regions.append(region_code)
+        self.dates.append(day)
+        self.cases.append(cases)
+        if self.contains_tests:
+            self.tests.append(tests)
+
+    def finish(self):
+        """
+        Creates the matrices. A region and day without any observation is NaN, so it is not mistaken for a day without cases
+
+        Returns
+        -------
+        regional_matrix
+            The regions x days matrices, sorted from oldest to most current date
+        """
+        try:
+            regions=list(self.region_codes)
+            ordinals,observation_days=np.unique(np.frombuffer(self.dates,dtype=np.int64),return_inverse=True)
+            shape=(len(regions),len(ordinals))
+            # one flat cell index per observation: bincount sums the observations of a cell much faster than np.add.at
+            cells=np.frombuffer(self.regions,dtype=np.int64)*len(ordinals)+observation_days.ravel()
+            observed=np.bincount(cells,minlength=shape[0]*shape[1]).reshape(shape)>0
+
+            def cell_sums(values):
+                sums=np.bincount(cells,weights=np.frombuffer(values,dtype=np.int64),minlength=shape[0]*shape[1]).reshape(shape)
+                return np.where(observed,sums,np.nan)
+
+            cases=cell_sums(self.cases)
+            tests=cell_sums(self.tests) if self.contains_tests else None
+            populations=np.array([self.populations[region] for region in regions],dtype=np.int64) if len(regions)>0 and all(region in self.populations for region in regions) else None
+            matrix=regional_matrix(regions,ordinals.astype(np.int32),cases,tests,populations)
+            if self.national in matrix.region_index:
+                matrix=matrix.split_national(self.national)
+            return matrix
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+class regional_matrix():
+    def __init__(self,regions,ordinals,cases,tests=None,populations=None,national=None):
+        """
+        Parameters
+        ----------
+        regions : list
+            The region names. Row i of the matrices belongs to regions[i]
+        ordinals : np.ndarray
+            The int32 day ordinals of the columns, sorted from oldest to most current date
+        cases : np.ndarray
+            The new cases with the shape (regions, days). NaN where a region has no data for a day
+        tests : np.ndarray
+            Optional. The tests with the shape (regions, days). NaN where a region has no data for a day
+        populations : np.ndarray
+            Optional. The population of each region
+        national : regional_matrix
+            Optional. The national total as published by the source, a matrix with a single row and the same days. None if the total is the sum of the regions
+        """
+        self.regions=list(regions)
+        self.ordinals=ordinals
+        self.cases=cases
+        self.tests=tests
+        self.populations=populations
+        self.national=national
+        self.region_index={region: ix for ix,region in enumerate(self.regions)}
+
+    def split_national(self,name):
+        """
+        Moves the row of the published national total out of the regions, so the regional statistics and the sum only cover the regions
+
+        Parameters
+        ----------
+        name : str
+            The name of the national row e.g. 'Österreich'
+
+        Returns
+        -------
+        regional_matrix
+            The matrix of the other regions with the national row as `national`
+        """
+        row=self.region_index[name]
+        keep=[ix for ix in range(len(self.regions)) if ix!=row]
+        pick=lambda values,rows: values[rows] if values is not None else None
+        national=regional_matrix([name],self.ordinals,pick(self.cases,[row]),pick(self.tests,[row]),pick(self.populations,[row]))
+        return regional_matrix([self.regions[ix] for ix in keep],self.ordinals,pick(self.cases,keep),pick(self.tests,keep),pick(self.populations,keep),national)
+
+    def since(self,since):
+        """
+        Drops the days before a date
+
+        Parameters
+        ----------
+        since : str
+            A date in isoformat
+
+        Returns
+        -------
+        regional_matrix
+            A matrix with the remaining days. The arrays are views of this matrix
+        """
+        first=np.searchsorted(self.ordinals,to_ordinals([since])[0])
+        national=self.national.since(since) if self.national is not None else None
+        return regional_matrix(self.regions,self.ordinals[first:],self.cases[:,first:],self.tests[:,first:] if self.tests is not None else None,self.populations,national)
+
+    def to_columns(self,region=None,reversed_dates=True):
+        """
+        Returns the time series of one region or the national series in the column format of the data preparation methods.
+        A region only keeps the days it has data for. The national series is the published total (see `national`) or else the sum of the regions,
+        which covers every day and skips the regions without data
+
+        Parameters
+        ----------
+        region : str
+            Optional. The name of the region. If None the national series is returned
+        reversed_dates : bool
+            A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+
+        Returns
+        -------
+        np.ndarray
+            The int32 day ordinals
+        np.ndarray
+            The int64 new cases
+        np.ndarray
+            The int64 tests. None if the source does not publish tests
+        """
+        if region is None and self.national is not None:
+            return self.national.to_columns(self.national.regions[0],reversed_dates=reversed_dates)
+        ordinals=self.ordinals
+        if region is None:
+            cases=np.nansum(self.cases,axis=0)
+            tests=np.nansum(self.tests,axis=0) if self.tests is not None else None
+        else:
+            row=self.region_index[region]
+            observed=~np.isnan(self.cases[row])
+            ordinals=ordinals[observed]
+            cases=self.cases[row][observed]
+            tests=self.tests[row][observed] if self.tests is not None else None
+        cases=cases.astype(np.int64)
+        tests=tests.astype(np.int64) if tests is not None else None
+        if reversed_dates:
+            ordinals,cases=ordinals[::-1],cases[::-1]
+            tests=tests[::-1] if tests is not None else None
+        return ordinals, cases, tests
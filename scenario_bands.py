@@ -0,0 +1,198 @@
+## Monte-Carlo forecast bands for the scenarios of `transform_enrich.simulate`. Every trajectory draws its own R and starting incidence;
+## the trajectories are simulated in fixed-size chunks, each with its own seed, so the results do not depend on the number of worker processes
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+import numpy as np
+from loguru import logger
+from date_normalisation import to_iso
+from transform_enrich import NO_CROSSING, crossing_days, generation_interval, renewal_cases, rolling_sums
+
+QUANTILES = (0.05,0.25,0.5,0.75,0.95)
+CHUNK_SIZE = 500 # trajectories per chunk: a chunk holds a few (chunk x window_length) float64 matrices at a time
+
+class forecast_bands():
+    def __init__(self,r_range,quantiles,dates,thresholds,bands7,bands14,crossing7,crossing14):
+        """
+        Parameters
+        ----------
+        r_range : list
+            The assumed (mean) R of each scenario
+        quantiles : tuple
+            The quantiles of the bands e.g. (0.05,0.5,0.95)
+        dates : list
+            The dates of the bands in isoformat
+        thresholds : list
+            The thresholds of the crossing distributions
+        bands7 : np.ndarray
+            The (R x quantile x day) cases per 100k over 7 days
+        bands14 : np.ndarray
+            The (R x quantile x day) cases per 100k over 14 days
+        crossing7 : np.ndarray
+            The (threshold x R x trajectory) days until a threshold is reached over 7 days, `NO_CROSSING` if it is not reached
+        crossing14 : np.ndarray
+            The same over 14 days
+        """
+        self.r_range=r_range
+        self.quantiles=quantiles
+        self.dates=dates
+        self.thresholds=thresholds
+        self.bands7=bands7
+        self.bands14=bands14
+        self.crossing7=crossing7
+        self.crossing14=crossing14
+
+    def crossing_probability(self,d7=True):
+        """ Returns the (threshold x R) share of the trajectories which reach a threshold within the simulated days """
+        crossing=self.crossing7 if d7 else self.crossing14
+        return (crossing!=NO_CROSSING).mean(axis=2)
+
+    def crossing_quantiles(self,d7=True):
+        """
+        Returns the crossing day distributions as quantiles: the q-quantile is the day by which a share q of the trajectories has reached the threshold
+
+        Returns
+        -------
+        np.ndarray
+            The (threshold x R x quantile) days. NaN if less than a share q of the trajectories reaches the threshold
+        """
+        crossing=(self.crossing7 if d7 else self.crossing14).astype(np.float64)
+        crossing[crossing==NO_CROSSING]=np.inf
+        # the inverted cdf: the smallest day reached by at least a share q of the trajectories (np.quantile has no `method` before numpy 1.22)
+        trajectories=crossing.shape[2]
+        ranks=np.maximum(np.ceil(np.asarray(self.quantiles)*trajectories).astype(np.int64)-1,0)
+        days=np.sort(crossing,axis=2)[:,:,ranks]
+        return np.where(np.isinf(days),np.nan,days)
+
+    def crossing_dates(self,d7=True):
+        """ Returns `crossing_quantiles` as nested lists of dates in isoformat, None where the threshold is not reached """
+        days=self.crossing_quantiles(d7)
+        dates=to_iso(date.today().toordinal()+np.nan_to_num(days).astype(np.int64))
+        return [[[None if np.isnan(day) else iso for day,iso in zip(q_days,q_dates)] for q_days,q_dates in zip(r_days,r_dates)] for r_days,r_dates in zip(days,dates)]
+
+def simulate_chunk(seed,size,R,cases_avg,population,thresholds,R_sd,cases_cv,engine,window_length,output_limit):
+    """
+    Simulates one chunk of trajectories of a scenario. Runs in the worker processes
+
+    Parameters
+    ----------
+    seed : np.random.SeedSequence
+        The seed of the chunk
+    size : int
+        The number of trajectories
+    R : float
+        The mean R of the scenario
+    cases_avg : float
+        The mean starting incidence (new cases per day)
+    population : int
+        The population of a country
+    thresholds : np.ndarray
+        The thresholds of the crossing days
+    R_sd : float
+        The standard deviation of R
+    cases_cv : float
+        The coefficient of variation of the (log-normal) starting incidence
+    engine : str
+        'linear' for the trend of `simulate.simulate_new_cases`, 'renewal' for `simulate.simulate_renewal_cases`
+    window_length : int
+        The amount of days to check where a threshold migth be reached
+    output_limit : int
+        The number of days kept for the bands
+
+    Returns
+    -------
+    tuple
+        The float32 (trajectory x day) cases per 100k over 7 and 14 days for the first `output_limit` days and the (threshold x trajectory) crossing days
+    """
+    rng=np.random.default_rng(seed)
+    R_draws=np.maximum(rng.normal(R,R_sd,size),0.01)
+    sigma=np.sqrt(np.log(1+cases_cv**2))
+    starts=cases_avg*rng.lognormal(-sigma**2/2,sigma,size)     # the mean stays cases_avg
+
+    if engine=='renewal':
+        generation=generation_interval()
+        cases=renewal_cases(R_draws,np.ones(len(generation)-1),window_length,generation)*starts[:,None]   # the renewal equation is linear in the past cases
+    else:
+        step_values=(R_draws**(7/4)-1)/7
+        cases=(1+step_values[:,None]*np.arange(window_length))*starts[:,None]
+
+    case_sums=rolling_sums(cases,(7,14),reversed_dates=False)
+    result=[]
+    for window in (7,14):
+        per100k=(case_sums[window]/population)*100000
+        below=thresholds[:,None]<per100k[:,window][None,:]
+        result+=[per100k[:,:output_limit].astype(np.float32),crossing_days(per100k,thresholds,first_day=window,below=below).astype(np.int32)]
+    return tuple(result)
+
+def simulate_bands(simulated,R_sd=0.05,cases_cv=0.1,trajectories=2000,engine='linear',quantiles=QUANTILES,output_limit=91,window_length=1000,
+                   chunk_size=CHUNK_SIZE,max_workers=None,seed=0):
+    """
+    Runs the Monte-Carlo mode of the scenarios: for each R of `simulated` the trajectories draw R from a normal distribution around it and the
+    starting incidence from a log-normal distribution around the current 7 day mean
+
+    Parameters
+    ----------
+    simulated : transform_enrich.simulate
+        The scenarios: R range, current cases, population and thresholds
+    R_sd : float
+        Optional. The standard deviation of R
+    cases_cv : float
+        Optional. The coefficient of variation of the starting incidence
+    trajectories : int
+        Optional. The number of trajectories per scenario
+    engine : str
+        Optional. 'linear' (default) or 'renewal'
+    quantiles : tuple
+        Optional. The quantiles of the bands and of the crossing days
+    output_limit : int
+        Optional. The number of days of the bands
+    window_length : int
+        Optional. The amount of days to check where a threshold migth be reached
+    chunk_size : int
+        Optional. The trajectories per chunk. Bounds the memory of a worker
+    max_workers : int
+        Optional. The number of worker processes. Defaults to the number of CPUs; 1 runs the chunks in this process
+    seed : int
+        Optional. The seed. The same seed and chunk size give the same bands for any number of workers
+
+    Returns
+    -------
+    forecast_bands
+        The bands and the crossing days
+    """
+    try:
+        r_range=list(simulated.input_r_range)
+        thresholds=np.asarray(simulated.input_thresholds,dtype=np.float64)
+        sizes=[min(chunk_size,trajectories-start) for start in range(0,trajectories,chunk_size)]
+        jobs=[(R,size) for R in r_range for size in sizes]
+        seeds=np.random.SeedSequence(seed).spawn(len(jobs))
+        arguments=[seeds,[size for _,size in jobs],[R for R,_ in jobs]]
+        constants=[simulated.input_new_cases_avg,simulated.input_population,thresholds,R_sd,cases_cv,engine,window_length,output_limit]
+        arguments+=[itertools.repeat(constant) for constant in constants]
+
+        max_workers=max_workers or os.cpu_count() or 1
+        if max_workers==1:
+            chunks=list(map(simulate_chunk,*arguments))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                chunks=list(executor.map(simulate_chunk,*arguments))
+
+        # merge the chunks of each scenario: the bands over all trajectories, the crossing days are kept per trajectory
+        per_scenario=len(sizes)
+        bands7,bands14,crossing7,crossing14=[],[],[],[]
+        for first in range(0,len(chunks),per_scenario):
+            values7,days7,values14,days14=zip(*chunks[first:first+per_scenario])
+            bands7.append(np.quantile(np.concatenate(values7),quantiles,axis=0)) # the days without a complete window are NaN in every trajectory
+            bands14.append(np.quantile(np.concatenate(values14),quantiles,axis=0))
+            crossing7.append(np.concatenate(days7,axis=1))
+            crossing14.append(np.concatenate(days14,axis=1))
+        bands7,bands14=np.stack(bands7),np.stack(bands14)
+        crossing7,crossing14=np.stack(crossing7,axis=1),np.stack(crossing14,axis=1)
+
+        base=date.today().toordinal()
+        return forecast_bands(r_range,tuple(quantiles),to_iso(np.arange(base,base+bands7.shape[-1])),thresholds.tolist(),bands7,bands14,crossing7,crossing14)
+
+    except Exception as e:
+        logger.error(e)
+        raise
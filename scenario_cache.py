@@ -0,0 +1,206 @@
+## Memoised scenarios: the results of `simulate_new_cases` (or `simulate_renewal_cases`) and `create_th_values` are kept by a hash of their inputs,
+## in memory (least recently used entries are dropped first) and on disk (the least recently used files are deleted above a size limit)
+import hashlib
+import json
+import os
+import pathlib
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date
+from loguru import logger
+
+SCENARIO_FOLDER = pathlib.Path('download_cache/scenarios')
+CACHE_VERSION = 1                  # part of the key, so results of an older simulation are not reused
+MAX_MEMORY_ENTRIES = 32
+MAX_DISK_BYTES = 64*2**20
+SCENARIO_ATTRIBUTES = ['delta_range','cases_matrix','per100k_7d_matrix','per100k_14d_matrix','scenario_labels','scenario_final_R','scenario_keys',
+                       'threshold_days7','threshold_days14','th_above7','th_above14','th_below7','th_below14',
+                       'values7_above_th','values14_above_th','values7_below_th','values14_below_th']
+
+_cache = None
+_cache_lock = threading.Lock()
+
+class scenario_cache():
+    def __init__(self,folder=SCENARIO_FOLDER,max_entries=MAX_MEMORY_ENTRIES,max_disk_bytes=MAX_DISK_BYTES):
+        """
+        Parameters
+        ----------
+        folder : str
+            Optional. The folder of the disk tier. None keeps the scenarios only in memory
+        max_entries : int
+            Optional. The number of scenarios kept in memory
+        max_disk_bytes : int
+            Optional. The size of the disk tier. Above it the least recently used files are deleted
+        """
+        self.folder=pathlib.Path(folder) if folder is not None else None
+        self.max_entries=max_entries
+        self.max_disk_bytes=max_disk_bytes
+        self.memory=OrderedDict()
+        self.lock=threading.Lock() # a server may render several countries at once
+        self.memory_hits=0
+        self.disk_hits=0
+        self.misses=0
+
+    def key(self,simulated,window_length=1000,renewal=False):
+        """
+        Hashes the inputs of a simulation. The day is part of the key, since the results contain dates
+
+        Parameters
+        ----------
+        simulated : transform_enrich.simulate
+            The simulate object with its inputs
+        window_length : int
+            Optional. The amount of days to check where a threshold migth be reached
+        renewal : bool
+            Optional. True for `simulate_renewal_cases`, False for `simulate_new_cases`
+
+        Returns
+        -------
+        str
+            The hex digest
+        """
+        inputs=dict(version=CACHE_VERSION,day=date.today().toordinal(),renewal=renewal,window_length=int(window_length),
+                    new_cases_avg=float(simulated.input_new_cases_avg),new_cases_avg14=float(simulated.input_new_cases_avg14),
+                    population=float(simulated.input_population),R_range=[float(R) for R in simulated.input_r_range],
+                    thresholds=[float(th) for th in simulated.input_thresholds])
+        return hashlib.sha256(json.dumps(inputs,sort_keys=True).encode()).hexdigest()
+
+    def path(self,key):
+        return self.folder/f'{key}.pkl'
+
+    def get(self,key):
+        """
+        Returns the stored scenario state or None. A hit on disk is also kept in memory
+
+        Parameters
+        ----------
+        key : str
+            See `key`
+
+        Returns
+        -------
+        dict
+            The attribute name as key and its value as value (see `SCENARIO_ATTRIBUTES`)
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits+=1
+                return self.memory[key]
+        state=self.load(key)
+        with self.lock:
+            if state is None:
+                self.misses+=1
+                return None
+            self.disk_hits+=1
+        self.remember(key,state)
+        return state
+
+    def load(self,key):
+        """ Reads a state from the disk tier. Returns None if there is no (readable) file """
+        if self.folder is None or not self.path(key).exists():
+            return None
+        try:
+            with open(self.path(key),'rb') as f:
+                state=pickle.load(f) # the files are written by `put` of this module only
+            os.utime(self.path(key)) # the modification time orders the files for the eviction
+            return state
+        except Exception as e:
+            logger.error(f'Dropping the unreadable scenario file {self.path(key)}: {e}')
+            self.path(key).unlink(missing_ok=True)
+            return None
+
+    def put(self,key,state):
+        """
+        Stores a scenario state in memory and on disk
+
+        Parameters
+        ----------
+        key : str
+            See `key`
+        state : dict
+            The attribute name as key and its value as value
+        """
+        self.remember(key,state)
+        if self.folder is None:
+            return
+        try:
+            self.folder.mkdir(parents=True,exist_ok=True)
+            tmp_path=self.path(key).with_suffix('.tmp')
+            with open(tmp_path,'wb') as f:
+                pickle.dump(state,f,protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path,self.path(key))
+            self.evict()
+        except Exception as e:
+            logger.error(e) # the disk tier is optional, the scenario stays in memory
+
+    def remember(self,key,state):
+        """ Keeps a state in the memory tier and drops the least recently used entries above `max_entries` """
+        with self.lock:
+            self.memory[key]=state
+            self.memory.move_to_end(key)
+            while len(self.memory)>self.max_entries:
+                self.memory.popitem(last=False)
+
+    def evict(self):
+        """ Deletes the least recently used files until the disk tier fits into `max_disk_bytes` """
+        files=[(path.stat().st_mtime,path.stat().st_size,path) for path in self.folder.glob('*.pkl')]
+        total=sum(size for _,size,_ in files)
+        for _,size,path in sorted(files):
+            if total<=self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total-=size
+
+    def simulate(self,simulated,window_length=1000,renewal=False):
+        """
+        Runs `simulate_new_cases` (or `simulate_renewal_cases`) and `create_th_values`, or restores their results if the inputs were simulated before
+
+        Parameters
+        ----------
+        simulated : transform_enrich.simulate
+            The simulate object. Its attributes are set as if the simulation had run
+        window_length : int
+            Optional. The amount of days to check where a threshold migth be reached
+        renewal : bool
+            Optional. True for the renewal equation, False for the linear trend
+
+        Returns
+        -------
+        bool
+            True if the results were taken from the cache
+        """
+        try:
+            key=self.key(simulated,window_length,renewal)
+            state=self.get(key)
+            if state is not None:
+                for name,value in state.items():
+                    setattr(simulated,name,value)
+                simulated.set_scenario_views()
+                return True
+
+            if renewal:
+                simulated.simulate_renewal_cases(window_length=window_length)
+            else:
+                simulated.simulate_new_cases(window_length=window_length)
+            simulated.create_th_values()
+            # the simulation steps only log their errors: a partial result is not cached, otherwise every render of the day would replay it
+            missing=[name for name in SCENARIO_ATTRIBUTES if not hasattr(simulated,name)]
+            if missing:
+                logger.error(f'The simulation did not complete (missing {", ".join(missing)}). The scenarios are not cached')
+                return False
+            self.put(key,{name: getattr(simulated,name) for name in SCENARIO_ATTRIBUTES})
+            return False
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+def get_cache():
+    """ Returns the scenario cache shared by all renders of this process """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache=scenario_cache()
+        return _cache
@@ -0,0 +1,96 @@
+## Registry of the data sources. Every module in this package describes one country: a class `attributes_<code>` and a function `data_preparation_<code>`.
+## The modules are only imported when the country is used, so e.g. running France never loads the German geojson parser. For the same reason a source
+## imports extract_data and other numpy based modules (extract_data also needs requests) inside its data preparation, so reading the attributes stays cheap.
+##
+## The contract of a source (in this package or registered with `register_source`):
+## - `attributes_<code>(threshold_list,range_for_r)` sets at least `country_name`, `population`, `url`, `color_sizes` (see sources/fr.py),
+##   `CasesPer100k_thresholds` and `Range_for_R`. The attributes of `SOURCE_DEFAULTS` are optional
+## - `data_preparation_<code>(country_attributes,reversed_dates=True,response=None,since=None)` returns the columns (day ordinals, new cases, tests):
+##   int32, int64 and int64 arrays (tests None if the source has none). `response` is a response which was already requested with stream=True
+##   (None: request it with `extract_data.retrieve_data`), `since` a date in isoformat; earlier days may be skipped since they are already stored
+import importlib
+import pkgutil
+from loguru import logger
+
+SOURCE_DEFAULTS = dict(
+    contains_tests=False,   # True if the third column holds tests
+    csv=False,              # True for csv sources, otherwise the source is json
+    csv_separator=',',
+    csv_encoding='utf-8',
+    json_items='item',      # ijson prefix of the streamed json objects
+    ssl_ciphers=None,       # the default TLS settings
+    spool_download=False,   # True: spool the body to download_cache/spool and resume interrupted transfers (see spooled_download.py)
+    revision_days=14        # number of past days the source might still revise, see timeseries_store.py
+)
+
+_registry = {}      # country code -> module path
+_loaded = {}        # country code -> imported module
+
+def register_source(country,module_path):
+    """
+    Registers a data source which lives outside of this package. The module is not imported before the country is used
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+    module_path : str
+        The import path of the module e.g. 'my_sources.ch'. It has to provide `attributes_<country>` and `data_preparation_<country>` as described at the top of this module
+    """
+    _registry[country]=module_path
+    _loaded.pop(country,None)
+
+def discover_sources():
+    """ Registers every module of this package under its module name. Only the file names are read, nothing is imported """
+    for module in pkgutil.iter_modules(__path__):
+        if not module.name.startswith('_'):
+            _registry.setdefault(module.name,f'{__name__}.{module.name}')
+
+def available_sources():
+    """
+    Returns
+    -------
+    list
+        The codes of all registered countries
+    """
+    return list(_registry)
+
+def load_source(country):
+    """
+    Imports the module of a country on first use
+
+    Parameters
+    ----------
+    country : str
+        A two letter color code for a country e.g. 'de' for Germany
+
+    Returns
+    -------
+    module
+        The source module. None if no source is registered for this country
+    """
+    try:
+        module=_loaded.get(country)
+        if module is None:
+            if country not in _registry:
+                logger.error(f'No data source registered for country {country}')
+                return None
+            module=importlib.import_module(_registry[country])
+            _loaded[country]=module
+        return module
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def get_attributes_class(country):
+    """ Returns the class `attributes_<country>` of the source or None """
+    module=load_source(country)
+    return getattr(module,f'attributes_{country}',None) if module is not None else None
+
+def get_data_preparation(country):
+    """ Returns the function `data_preparation_<country>` of the source or None """
+    module=load_source(country)
+    return getattr(module,f'data_preparation_{country}',None) if module is not None else None
+
+discover_sources()
@@ -0,0 +1,101 @@
+## Austria: AGES timeline (csv)
+from loguru import logger
+
+class attributes_at:
+    def __init__(self,threshold_list,range_for_r):
+        self.country_name = 'Austria'
+        self.population = 8901064
+        self.url="https://covid19-dashboard.ages.at/data/CovidFaelle_Timeline.csv"
+        self.contains_tests=False
+        self.csv_encoding='utf-8'
+        self.csv_separator=';'
+        self.csv=True # if the resources have csv format
+        self.ssl_ciphers='ALL:@SECLEVEL=1' # lowering the ssl secure level for Austria - #facepalm. Austrian server apparently uses SSL security level 1 while others use level 2
+        self.spool_download=False # stream the response directly
+        self.revision_days=14 # number of past days the source might still revise
+        self.CasesPer100k_thresholds=threshold_list
+        self.Range_for_R=range_for_r
+        self.color_sizes=dict(
+            colorEvenRows = '#F3EED9',       #'#FFE3F1'#'#FFAFAE'
+            colorOddRows = 'white',
+            colorHeaderBG='#ED2939',
+            sizeHeaderFont = 14,
+            colorHeaderFont='white',
+            colorCellFont = 'black',
+            sizeCellFont = 12,
+            colorTitle = '#ED2939',
+            sizeTitleFont = 27,
+            colorPivotColumnText='#ED2939'
+        )
+# Austria: What the fuck?! The way data is published I would guess this country is a banana republic
+
+def data_preparation_at(country_attributes,reversed_dates=True,response=None,since=None):
+    """
+    Creates sorted columns of day ordinals, new cases and tests for the Austrian Covid-19 data
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    reversed_dates : bool
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped, since they are already stored
+
+    Returns
+    -------
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if the source does not publish tests
+    """
+    try:
+        # the national series is the published total 'Österreich', the Bundesländer are parsed in the same pass
+        regions=prepare_regions_at(country_attributes,response=response,since=since)
+        return regions.to_columns(reversed_dates=reversed_dates)
+
+    except Exception as e:
+        logger.error(e)
+
+def prepare_regions_at(country_attributes,response=None,since=None):
+    """
+    Creates a (Bundesland x day) matrix of the Austrian Covid-19 data. The csv has one row per Bundesland and day plus a row for 'Österreich',
+    which is kept as the national total of the matrix instead of a Bundesland
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Days before this date are dropped
+
+    Returns
+    -------
+    regional_matrix
+        The new cases and the population of every Bundesland. The row 'Österreich' is in `national`
+    """
+    try:
+        from extract_data import retrieve_data
+        from regional_matrix import regional_builder
+        rows=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+        column_names=next(rows)
+        date_ix=column_names.index('Time')
+        region_ix=column_names.index('Bundesland')
+        population_ix=column_names.index('AnzEinwohner')
+        cases_ix=column_names.index('AnzahlFaelle')
+
+        # the days before `since` are dropped while the csv streams in, so only the new rows are buffered
+        regions=regional_builder(date_format='%d.%m.%Y %H:%M:%S',since=since,national='Österreich')
+        for row in rows:
+            regions.add(row[region_ix],row[date_ix],int(row[cases_ix]),population=int(row[population_ix]))
+        return regions.finish()
+
+    except Exception as e:
+        logger.error(e)
+        raise
@@ -0,0 +1,94 @@
+## Belgium: Sciensano tests per province and day (json)
+from loguru import logger
+
+class attributes_be:
+    def __init__(self,threshold_list,range_for_r):
+        self.country_name = 'Belgium'
+        self.population = 11492641
+        self.url = 'https://epistat.sciensano.be/Data/COVID19BE_tests.json'
+        self.contains_tests=True
+        self.json_items='item' # ijson prefix of the streamed json objects
+        self.csv=False # if the resources have csv format
+        self.ssl_ciphers=None # use the default TLS settings
+        self.spool_download=False # stream the response directly
+        self.revision_days=14 # number of past days the source might still revise
+        self.CasesPer100k_thresholds=threshold_list
+        self.Range_for_R=range_for_r
+        self.color_sizes = dict(
+            colorEvenRows = '#FFE6D9',
+            colorOddRows = 'white',
+            colorHeaderBG= '#FDDA24',
+            sizeHeaderFont = 14,
+            colorHeaderFont='black',
+            colorCellFont = 'black',
+            sizeCellFont = 12,
+            colorTitle = 'black',
+            sizeTitleFont = 27,
+            colorPivotColumnText='#EF3340' 
+        )
+
+def data_preparation_be(country_attributes,reversed_dates=True,response=None,since=None):
+    """
+    Creates sorted columns of day ordinals, new cases and tests for the Belgian Covid-19 data
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    reversed_dates : bool
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped, since they are already stored
+
+    Returns
+    -------
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if the source does not publish tests
+    """
+    try:
+        # the provinces are kept in a regional matrix while the file streams in; the national series is their sum
+        regions=prepare_regions_be(country_attributes,response=response,since=since)
+        return regions.to_columns(reversed_dates=reversed_dates)
+
+    except Exception as e:
+        logger.error(e)
+
+def prepare_regions_be(country_attributes,response=None,since=None):
+    """
+    Creates a (province x day) matrix of the Belgian Covid-19 data. The json has one item per province and day
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Days before this date are dropped
+
+    Returns
+    -------
+    regional_matrix
+        The new cases and tests of every province
+    """
+    try:
+        from extract_data import retrieve_data
+        from regional_matrix import regional_builder
+        items=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+        regions=regional_builder(contains_tests=True,since=since)
+        for item in items:
+            current_date=item.get('DATE')
+            if current_date is None: # there is some none types at the end of the JSON
+                continue
+            regions.add(item.get('PROVINCE') or 'Unknown',current_date,item['TESTS_ALL_POS'],item['TESTS_ALL'])
+        return regions.finish()
+
+    except Exception as e:
+        logger.error(e)
+        raise
@@ -0,0 +1,228 @@
+## Germany: Robert Koch-Institut case data as geojson. Millions of features, parsed as a stream
+import time
+from array import array
+from loguru import logger
+from datetime import date
+
+DE_CHUNK_SIZE = 1<<18 # observations per accumulation chunk
+DE_CUBE_DIMENSIONS = ['Bundesland','Landkreis','Altersgruppe','Geschlecht'] # properties of every RKI feature which can be sliced and rolled up
+
+class attributes_de:
+    def __init__(self,threshold_list,range_for_r):
+        self.country_name = 'Germany'
+        self.population = 83190556
+        self.url = 'https://opendata.arcgis.com/datasets/dd4580c810204019a7b8eb3e0b329dd6_0.geojson'
+        self.contains_tests=False
+        self.json_items='features.item.properties' # ijson prefix of the streamed json objects
+        self.csv=False # if the resources have csv format
+        self.ssl_ciphers=None # use the default TLS settings
+        self.spool_download=True # spool the large geojson to disk and resume interrupted downloads (see spooled_download.py)
+        self.revision_days=28 # late reports are still added to past reporting dates
+        self.CasesPer100k_thresholds=threshold_list
+        self.Range_for_R=range_for_r
+        self.color_sizes = dict(
+            colorEvenRows = '#FFE6D9',
+            colorOddRows = 'white',
+            colorHeaderBG= '#FFCE00',
+            sizeHeaderFont = 14,
+            colorHeaderFont='black',
+            colorCellFont = 'black',
+            sizeCellFont = 12,
+            colorTitle = 'black',
+            sizeTitleFont = 27,
+            colorPivotColumnText='#DD0000'
+        )
+
+def data_preparation_de(country_attributes,reversed_dates=True,response=None,since=None):
+    """
+    Creates sorted columns of day ordinals, new cases and tests for the German Covid-19 data
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    reversed_dates : bool
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped, since they are already stored
+
+    Returns
+    -------
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if the source does not publish tests
+    """
+    try:
+        import numpy as np
+        from extract_data import retrieve_data
+        from date_normalisation import to_ordinal
+        items=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+        start_time=time.time()
+
+        # Meldedatum only has a few hundred distinct values: every distinct string is converted once to a day ordinal.
+        # The ordinals and cases are buffered in compact arrays and added to the day counts chunk by chunk
+        ordinal_memo={}
+        since_ordinal=date.fromisoformat(since).toordinal() if since is not None else None
+        day_counts=np.zeros(0,dtype=np.int64)
+        day_seen=np.zeros(0,dtype=bool)
+        origin=None
+        ordinals=array('q')
+        cases=array('q')
+        record_count=0
+        for item in items:
+            raw_date=item['Meldedatum']
+            day=ordinal_memo.get(raw_date)
+            if day is None:
+                day=to_ordinal(raw_date) # '2020-03-01T00:00:00.000Z' or '2020/03/01 00:00:00+00'
+                if since_ordinal is not None and day<since_ordinal:
+                    day=-1 # already stored
+                ordinal_memo[raw_date]=day
+            record_count+=1
+            if day<0:
+                continue
+            ordinals.append(day)
+            cases.append(item['AnzahlFall'])
+            if len(ordinals)>=DE_CHUNK_SIZE:
+                day_counts,day_seen,origin=accumulate_days(day_counts,day_seen,origin,ordinals,cases)
+                ordinals=array('q')
+                cases=array('q')
+        day_counts,day_seen,origin=accumulate_days(day_counts,day_seen,origin,ordinals,cases)
+
+        elapsed=max(time.time()-start_time,1e-9)
+        logger.info(f'Germany: parsed {record_count} records in {elapsed:.1f} seconds ({record_count/elapsed:,.0f} records/s)')
+
+        seen_ix=np.flatnonzero(day_seen)
+        if reversed_dates:
+            seen_ix=seen_ix[::-1]
+        if origin is None:
+            origin=0
+        return (seen_ix+origin).astype(np.int32), day_counts[seen_ix], None
+
+    except Exception as e:
+        logger.error(e)
+
+def accumulate_days(day_counts,day_seen,origin,ordinals,cases):
+    """
+    Adds a chunk of observations to the daily counts. The count array is indexed by day ordinal minus `origin` and grows if a chunk contains days outside its range
+
+    Parameters
+    ----------
+    day_counts : np.ndarray
+        The int64 array with the cases per day
+    day_seen : np.ndarray
+        A boolean array which is True for each day with at least one observation
+    origin : int
+        The day ordinal of the first element of day_counts. None if nothing was accumulated yet
+    ordinals : array
+        The day ordinals of the observations in this chunk
+    cases : array
+        The cases of the observations in this chunk
+
+    Returns
+    -------
+    np.ndarray
+        The updated day counts
+    np.ndarray
+        The updated seen days
+    int
+        The (possibly moved) origin
+    """
+    import numpy as np
+    if len(ordinals)==0:
+        return day_counts,day_seen,origin
+    chunk_ordinals=np.frombuffer(ordinals,dtype=np.int64)
+    chunk_cases=np.frombuffer(cases,dtype=np.int64)
+    low=int(chunk_ordinals.min())
+    high=int(chunk_ordinals.max())
+    if origin is None:
+        origin=low
+    if low<origin:
+        day_counts=np.concatenate([np.zeros(origin-low,dtype=np.int64),day_counts])
+        day_seen=np.concatenate([np.zeros(origin-low,dtype=bool),day_seen])
+        origin=low
+    if high-origin>=len(day_counts):
+        grow=high-origin+1-len(day_counts)+366 # leave room for the next chunks
+        day_counts=np.concatenate([day_counts,np.zeros(grow,dtype=np.int64)])
+        day_seen=np.concatenate([day_seen,np.zeros(grow,dtype=bool)])
+    index=chunk_ordinals-origin
+    # bincount is much faster than np.add.at; the float64 sums of the integer cases are exact below 2**53
+    day_counts+=np.bincount(index,weights=chunk_cases,minlength=len(day_counts)).astype(np.int64)
+    day_seen[index]=True
+    return day_counts,day_seen,origin
+
+def prepare_cube_de(country_attributes,response=None,since=None,dimensions=DE_CUBE_DIMENSIONS):
+    """
+    Creates a count cube over the German Covid-19 data in a single pass e.g. Landkreis x Altersgruppe x Geschlecht x date.
+    National, state and district series are slices and roll-ups of the same cube (see case_cube.py), so the geojson is only parsed once
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped
+    dimensions : list
+        Optional. Defaults to DE_CUBE_DIMENSIONS. The feature properties used as dimensions
+
+    Returns
+    -------
+    case_cube
+        The cube with the new cases
+    """
+    try:
+        from extract_data import retrieve_data
+        from date_normalisation import to_ordinal
+        from case_cube import case_cube
+        items=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+        start_time=time.time()
+
+        # like in `data_preparation_de` every distinct date string and every distinct combination of dimension values is encoded once
+        cube=case_cube(dimensions)
+        ordinal_memo={}
+        group_memo={}
+        since_ordinal=date.fromisoformat(since).toordinal() if since is not None else None
+        groups=array('q')
+        ordinals=array('q')
+        cases=array('q')
+        record_count=0
+        for item in items:
+            raw_date=item['Meldedatum']
+            day=ordinal_memo.get(raw_date)
+            if day is None:
+                day=to_ordinal(raw_date)
+                if since_ordinal is not None and day<since_ordinal:
+                    day=-1 # already stored
+                ordinal_memo[raw_date]=day
+            record_count+=1
+            if day<0:
+                continue
+            values=tuple([item[dimension] for dimension in dimensions])
+            group=group_memo.get(values)
+            if group is None:
+                group=cube.add_group(values)
+                group_memo[values]=group
+            groups.append(group)
+            ordinals.append(day)
+            cases.append(item['AnzahlFall'])
+            if len(ordinals)>=DE_CHUNK_SIZE:
+                cube.add_chunk(groups,ordinals,cases)
+                groups=array('q')
+                ordinals=array('q')
+                cases=array('q')
+        cube.add_chunk(groups,ordinals,cases)
+        cube.finish()
+
+        elapsed=max(time.time()-start_time,1e-9)
+        logger.info(f'Germany: parsed {record_count} records into {len(cube)} cube cells in {elapsed:.1f} seconds ({record_count/elapsed:,.0f} records/s)')
+        return cube
+
+    except Exception as e:
+        logger.error(e)
+        raise
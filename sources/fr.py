@@ -0,0 +1,80 @@
+## France: synthesis of the indicators (csv)
+from loguru import logger
+
+# https://www.data.gouv.fr/fr/datasets/synthese-des-indicateurs-de-suivi-de-lepidemie-covid-19/
+class attributes_fr:
+    def __init__(self,threshold_list,range_for_r):
+        self.country_name = 'France'
+        self.population = 67406000
+        self.url = "https://www.data.gouv.fr/fr/datasets/r/f335f9ea-86e3-4ffa-9684-93c009d5e617"
+        self.contains_tests=True
+        self.csv_encoding='latin'
+        self.csv_separator=','
+        self.csv=True                   # if the resources have csv format
+        self.ssl_ciphers=None # use the default TLS settings
+        self.spool_download=False # stream the response directly
+        self.revision_days=14 # number of past days the source might still revise
+        self.CasesPer100k_thresholds=threshold_list
+        self.Range_for_R=range_for_r
+        self.color_sizes=dict(
+            colorEvenRows = '#FFE6D9',       #'#FFE3F1'#'#FFAFAE'
+            colorOddRows = 'white',
+            colorHeaderBG='#001489',
+            sizeHeaderFont = 14,
+            colorHeaderFont='white',
+            colorCellFont = 'black',
+            sizeCellFont = 12,
+            colorTitle = '#001489',
+            sizeTitleFont = 27,
+            colorPivotColumnText='#001489'
+        )
+
+def data_preparation_fr(country_attributes,reversed_dates=True,response=None,since=None):
+    """
+    Creates sorted columns of day ordinals, new cases and tests for the French Covid-19 data
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    reversed_dates : bool
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped, since they are already stored
+
+    Returns
+    -------
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if the source does not publish tests
+    """
+    try:
+        from extract_data import retrieve_data, aggregate_to_columns
+        rows=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+        column_names=next(rows)
+        date_ix=column_names.index('date')
+        cases_ix=column_names.index('pos')
+        rate_ix=column_names.index('tx_pos')
+        cases_dict={}
+        tests_dict={}
+
+        for row in rows:
+            if row[cases_ix] is None or len(row[rate_ix])==0:
+                continue
+            else:
+                cases=int(row[cases_ix])
+                rate=float(row[rate_ix])/100
+                current_date=row[date_ix]
+                estimated_tests=int(round(cases/rate))
+                cases_dict[current_date]=cases
+                tests_dict[current_date]=estimated_tests
+
+        return aggregate_to_columns(cases_dict,tests_dict,reversed_dates=reversed_dates,since=since)
+
+    except Exception as e:
+        logger.error(e)
@@ -0,0 +1,68 @@
+## Latvia: data.gov.lv datastore (json)
+from loguru import logger
+
+class attributes_lv:
+    def __init__(self,threshold_list,range_for_r):
+        self.country_name = 'Latvia'
+        self.population = 1907675
+        self.url = 'https://data.gov.lv/dati/eng/api/3/action/datastore_search_sql?sql=SELECT%20*%20from%20%22d499d2f0-b1ea-4ba2-9600-2c701b03bd4a%22'
+        self.contains_tests=True
+        self.json_items='result.records.item' # ijson prefix of the streamed json objects
+        self.csv=False # if the resources have csv format
+        self.ssl_ciphers=None # use the default TLS settings
+        self.spool_download=False # stream the response directly
+        self.revision_days=14 # number of past days the source might still revise
+        self.CasesPer100k_thresholds=threshold_list
+        self.Range_for_R=range_for_r
+        self.color_sizes=dict(
+            colorEvenRows = '#F3EED9',       #'#FFE3F1'#'#FFAFAE'
+            colorOddRows = 'white',
+            colorHeaderBG='#9E3039',
+            sizeHeaderFont = 14,
+            colorHeaderFont='white',
+            colorCellFont = 'black',
+            sizeCellFont = 12,
+            colorTitle = '#9E3039',
+            sizeTitleFont = 27,
+            colorPivotColumnText='#9E3039'
+        )
+
+def data_preparation_lv(country_attributes,reversed_dates=True,response=None,since=None):
+    """
+    Creates sorted columns of day ordinals, new cases and tests for the Latvian Covid-19 data
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    reversed_dates : bool
+        A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+    response : requests.Response
+        Optional. A response which was already requested with `request_source`. If None the request is sent here
+    since : str
+        Optional. A date in isoformat. Observations before this date are skipped, since they are already stored
+
+    Returns
+    -------
+    np.ndarray
+        The int32 day ordinals
+    np.ndarray
+        The int64 new cases
+    np.ndarray
+        The int64 tests. None if the source does not publish tests
+    """
+    try:
+        from extract_data import retrieve_data, aggregate_to_columns
+        items=retrieve_data(country_attributes,country_attributes.url,stream=True,response=response)
+
+        cases_dict={}
+        tests_dict={}
+        for item in items:
+            current_date=item['Datums']
+            cases_dict[current_date]=int(item['ApstiprinataCOVID19InfekcijaSkaits'])
+            tests_dict[current_date]=int(item['TestuSkaits'])
+
+        return aggregate_to_columns(cases_dict,tests_dict,reversed_dates=reversed_dates,since=since)
+
+    except Exception as e:
+        logger.error(e)
@@ -0,0 +1,174 @@
+## Resumable downloads of large resources. The body is spooled to a local file and an interrupted transfer is continued with a HTTP Range request
+import gzip
+import json
+import pathlib
+from urllib.parse import urlparse
+import requests
+import urllib3
+from loguru import logger
+from http_session import get_session, TIMEOUT
+
+SPOOL_FOLDER = pathlib.Path('download_cache/spool')
+SPOOL_CHUNK_SIZE = 1<<20 # bytes written per read
+MAX_RESUMES = 8          # number of interruptions tolerated per download
+ACCEPT_ENCODING = 'gzip' # the body is spooled as sent. Only gzip (or no encoding) is decoded when the file is read
+TRANSFER_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.Timeout, urllib3.exceptions.HTTPError)
+
+def spool_paths(url):
+    """
+    Returns the spool file and the file with its metadata. The name is taken from the url, so the same resource always ends up in the same file
+
+    Parameters
+    ----------
+    url : str
+        The url of the resource
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the (partial) body
+    pathlib.Path
+        The path of the metadata (url, validators and content encoding)
+    """
+    url_parts=urlparse(url)
+    name=pathlib.Path(url_parts.path).name or url_parts.netloc
+    return SPOOL_FOLDER/f'{name}.part', SPOOL_FOLDER/f'{name}.json'
+
+def entity_validators(response):
+    """ The validators which identify the version of a resource. A partial file is only resumed if they did not change """
+    return dict(etag=response.headers.get('ETag'),last_modified=response.headers.get('Last-Modified'))
+
+def if_range(validators):
+    """ The If-Range header value: a strong ETag or else the Last-Modified date. None if the server sent neither """
+    etag=validators.get('etag')
+    if etag is not None and not etag.startswith('W/'):
+        return etag
+    return validators.get('last_modified')
+
+def expected_length(response,offset):
+    """ The size of the complete body in bytes, taken from Content-Range or Content-Length. None if the server does not tell """
+    content_range=response.headers.get('Content-Range')
+    if content_range is not None and '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/',1)[1])
+    content_length=response.headers.get('Content-Length')
+    if content_length is not None:
+        return int(content_length)+(offset if response.status_code==206 else 0)
+    return None
+
+def spool_download(country_attributes,url,response=None):
+    """
+    Downloads a resource into the spool folder. If the connection drops, the download is continued from the last written byte
+    with a Range request. A partial file of an earlier run is resumed as well, as long as the server still sends the same ETag/Last-Modified.
+    The body is written as sent (i.e. still compressed), which keeps the byte offsets of the Range requests valid.
+    Without an ETag or Last-Modified date a changed resource could not be detected, so such downloads start over instead
+
+    Parameters
+    ----------
+    country_attributes : dict
+        A dictionary containing country attributes
+    url : str
+        The url of the resource
+    response : requests.Response
+        Optional. A response which was already requested with stream=True. If None the request is sent here
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the complete body
+    str
+        The content encoding of the body e.g. 'gzip'. None if the body is not encoded
+    """
+    try:
+        session=get_session(country_attributes)
+        part_path,meta_path=spool_paths(url)
+        SPOOL_FOLDER.mkdir(parents=True,exist_ok=True)
+        if response is None:
+            response=session.get(url,stream=True,headers={'Accept-Encoding': ACCEPT_ENCODING},timeout=TIMEOUT)
+
+        meta=json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        validators=entity_validators(response)
+        offset=part_path.stat().st_size if part_path.exists() else 0
+        if offset>0 and meta.get('url')==url and meta.get('validators')==validators and if_range(validators) is not None:
+            logger.info(f'Resuming the download of {url} at {offset:,} bytes')
+            response.close()
+            response=None
+        else:
+            offset=0
+
+        resumes=0
+        while True:
+            try:
+                if response is None:
+                    headers={'Accept-Encoding': ACCEPT_ENCODING}
+                    if if_range(validators) is not None:
+                        headers.update({'Range': f'bytes={offset}-', 'If-Range': if_range(validators)})
+                    response=session.get(url,stream=True,headers=headers,timeout=TIMEOUT)
+                if response.status_code==416 and offset>0 and meta.get('length')==offset:
+                    break # the partial file was already complete
+                if response.status_code==200:
+                    offset=0 # the server does not support ranges or the resource changed: start over
+                    validators=entity_validators(response)
+                elif response.status_code!=206:
+                    raise requests.exceptions.HTTPError(f'Get request failed with HTTP status code: {response.status_code}',response=response)
+
+                length=expected_length(response,offset)
+                meta=dict(url=url,validators=validators,encoding=response.headers.get('Content-Encoding'),length=length)
+                meta_path.write_text(json.dumps(meta))
+                with open(part_path,'r+b' if offset>0 else 'wb') as f:
+                    f.truncate(offset)
+                    f.seek(offset)
+                    # decode_content=False: the raw bytes are spooled, so offsets match the bytes the server counts
+                    for chunk in response.raw.stream(SPOOL_CHUNK_SIZE,decode_content=False):
+                        f.write(chunk)
+                        offset+=len(chunk)
+                response.close()
+                response=None
+                if length is not None and offset<length:
+                    raise requests.exceptions.ChunkedEncodingError(f'Connection closed after {offset:,} of {length:,} bytes')
+                break
+
+            except TRANSFER_ERRORS as e:
+                if response is not None:
+                    response.close()
+                    response=None
+                resumes+=1
+                if resumes>MAX_RESUMES:
+                    raise
+                if if_range(validators) is None:
+                    logger.warning(f'Download of {url} interrupted at {offset:,} bytes ({e}). The server sends no validators, starting over ({resumes}/{MAX_RESUMES})')
+                else:
+                    logger.warning(f'Download of {url} interrupted at {offset:,} bytes ({e}). Resuming ({resumes}/{MAX_RESUMES})')
+
+        logger.info(f'Spooled {offset:,} bytes of {url} to {part_path}')
+        return part_path, meta.get('encoding')
+
+    except Exception as e:
+        logger.error(e)
+        raise
+
+def open_spooled(path,encoding=None):
+    """
+    Opens a spooled body for reading and decodes it if necessary
+
+    Parameters
+    ----------
+    path : pathlib.Path
+        The path returned by `spool_download`
+    encoding : str
+        Optional. The content encoding of the body. 'gzip' is decompressed while reading
+
+    Returns
+    -------
+    file
+        A binary file object
+    """
+    if encoding=='gzip':
+        return gzip.open(path,'rb')
+    elif encoding in (None,'identity'):
+        return open(path,'rb')
+    raise ValueError(f'Unsupported content encoding of a spooled download: {encoding}')
+
+def remove_spooled(url):
+    """ Deletes the spool file of a url after it was parsed successfully """
+    for path in spool_paths(url):
+        path.unlink(missing_ok=True)
@@ -0,0 +1,60 @@
+## The threshold crossing solver (`transform_enrich.crossing_days`) against a day by day scan of every trajectory
+import pathlib
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pytest
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0,str(BASE_DIR))
+
+from transform_enrich import NO_CROSSING, crossing_days, simulate
+
+def scan(trajectories,thresholds,first_day,below):
+    """ The first day from `first_day` on with a value below (or above) each threshold, one trajectory and threshold at a time """
+    below=np.broadcast_to(np.asarray(below,dtype=bool),(len(thresholds),len(trajectories)))
+    days=np.full((len(thresholds),len(trajectories)),NO_CROSSING)
+    for th_ix,threshold in enumerate(thresholds):
+        for ix,trajectory in enumerate(trajectories):
+            for day in range(first_day,len(trajectory)):
+                if (trajectory[day]<threshold) if below[th_ix,ix] else (trajectory[day]>threshold):
+                    days[th_ix,ix]=day
+                    break
+    return days
+
+def random_grid(rng,rows,days):
+    """ Linear trends in both directions (some flat), exponential trends, plateaus and random walks """
+    starts=rng.uniform(0,500,rows)[:,None]
+    kinds=rng.integers(0,4,rows)[:,None]
+    steps=np.arange(days)[None,:]
+    slopes=rng.normal(0,2,rows)[:,None]*(rng.random((rows,1))>0.1)
+    linear=starts+slopes*steps
+    exponential=starts*rng.uniform(0.95,1.05,rows)[:,None]**steps
+    plateaus=starts+np.round(slopes*steps/10)*10
+    walks=starts+np.cumsum(rng.normal(0,5,(rows,days)),axis=1)
+    return np.choose(kinds,[linear,exponential,plateaus,walks])
+
+@pytest.mark.parametrize('seed',range(50))
+def test_crossing_days_match_scan(seed):
+    rng=np.random.default_rng(seed)
+    trajectories=random_grid(rng,int(rng.integers(1,30)),int(rng.integers(1,120)))
+    thresholds=np.concatenate([rng.uniform(-50,700,int(rng.integers(1,15))),trajectories[0,:2]]) # thresholds equal to a value as well
+    first_day=int(rng.integers(0,15))
+    for below in (True,False,rng.random((len(thresholds),len(trajectories)))<0.5):
+        assert np.array_equal(crossing_days(trajectories,thresholds,first_day=first_day,below=below),scan(trajectories,thresholds,first_day,below))
+
+@pytest.mark.parametrize('seed',range(10))
+def test_threshold_dates_of_the_scenarios(seed):
+    rng=np.random.default_rng(seed)
+    R_range=sorted(rng.uniform(0.6,1.4,int(rng.integers(2,12))).round(2).tolist())
+    thresholds=sorted(rng.uniform(1,1000,int(rng.integers(2,12))).round().tolist())
+    simulated=simulate(float(rng.uniform(10,5000)),int(rng.integers(100000,80000000)),R_range,thresholds)
+    simulated.simulate_new_cases(window_length=300)
+
+    today=date.today()
+    for interval,matrix,dates in ((7,simulated.per100k_7d_matrix,simulated.threshold_days7),(14,simulated.per100k_14d_matrix,simulated.threshold_days14)):
+        below=np.asarray(thresholds)[:,None]<matrix[:,interval][None,:] # thresholds under the first value are reached when the cases fall
+        days=scan(matrix,thresholds,interval,below)
+        expected=[[None if day==NO_CROSSING else (today+timedelta(days=int(day))).isoformat() for day in th_days] for th_days in days]
+        assert dates[1:]==expected
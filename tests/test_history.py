@@ -0,0 +1,84 @@
+## Incremental history updates (`history.update_values`, history_cache.py) against a full calculation of the same series
+import pathlib
+import sys
+import numpy as np
+import pytest
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0,str(BASE_DIR))
+
+from transform_enrich import history
+from history_cache import update_history
+
+POPULATION = 1907675
+
+def random_series(days,contains_tests,seed):
+    """ Returns chronological day ordinals, cases and tests (NaN where missing, None without tests) """
+    rng=np.random.default_rng(seed)
+    ordinals=np.arange(737500,737500+days,dtype=np.int32)
+    cases=rng.integers(0,2000,days).astype(np.int64)
+    tests=None
+    if contains_tests:
+        tests=rng.integers(1000,50000,days).astype(np.float64)
+        tests[rng.random(days)<0.1]=np.nan
+    return ordinals, cases, tests
+
+def daily_dict(ordinals,cases,tests,reversed_dates,rows=slice(None)):
+    """ The days of `rows` (chronological) in the order of the table """
+    order=(lambda column: column[rows][::-1]) if reversed_dates else (lambda column: column[rows])
+    return {'Date': order(ordinals),'New Cases': order(cases),'Tests': order(tests) if tests is not None else None}
+
+def full_table(ordinals,cases,tests,reversed_dates):
+    historical_data=history()
+    historical_data.calculate_values(POPULATION,daily_dict(ordinals,cases,tests,reversed_dates),reversed_dates=reversed_dates)
+    return historical_data.table
+
+def assert_same_table(table,expected):
+    assert table.names==expected.names
+    for name,column,expected_column in zip(table.names,table.columns,expected.columns):
+        assert np.array_equal(column,expected_column,equal_nan=True), name
+
+@pytest.mark.parametrize('reversed_dates',[True,False])
+@pytest.mark.parametrize('contains_tests',[True,False])
+@pytest.mark.parametrize('seed',range(5))
+def test_updates_match_full_calculation(reversed_dates,contains_tests,seed):
+    rng=np.random.default_rng(100+seed)
+    ordinals,cases,tests=random_series(400,contains_tests,seed)
+    known=int(rng.integers(1,200))
+    historical_data=history()
+    historical_data.calculate_values(POPULATION,daily_dict(ordinals,cases,tests,reversed_dates,slice(0,known)),reversed_dates=reversed_dates)
+
+    # every update revises some of the last days (with new values) and appends new days
+    while known<len(ordinals):
+        first=max(0,known-int(rng.integers(0,20)))
+        last=min(len(ordinals),known+int(rng.integers(0,40)))
+        cases[first:known]+=rng.integers(0,5,known-first)
+        assert historical_data.update_values(daily_dict(ordinals,cases,tests,reversed_dates,slice(first,last))) is not None
+        known=max(known,last)
+        assert_same_table(historical_data.table,full_table(ordinals[:known],cases[:known],tests[:known] if tests is not None else None,reversed_dates))
+
+def test_update_which_does_not_fit_returns_none():
+    ordinals,cases,tests=random_series(50,True,0)
+    historical_data=history()
+    historical_data.calculate_values(POPULATION,daily_dict(ordinals,cases,tests,True,slice(0,30)),reversed_dates=True)
+    assert historical_data.update_values(daily_dict(ordinals,cases,tests,True,slice(35,40))) is None # a gap after the last known day
+
+@pytest.mark.parametrize('contains_tests',[True,False])
+def test_history_cache_updates_only_the_changed_days(tmp_path,contains_tests):
+    ordinals,cases,tests=random_series(300,contains_tests,1)
+    update_history('xx',POPULATION,daily_dict(ordinals[:280],cases[:280],tests[:280] if tests is not None else None,True),None,folder=tmp_path)
+
+    cases[270:280]+=1 # revised days
+    historical_data=update_history('xx',POPULATION,daily_dict(ordinals,cases,tests,True),ordinals[270:],folder=tmp_path)
+    assert historical_data.updated_rows==slice(0,30)
+    assert_same_table(historical_data.table,full_table(ordinals,cases,tests,True))
+
+def test_history_cache_recalculates_a_stale_table(tmp_path):
+    ordinals,cases,tests=random_series(300,True,2)
+    update_history('xx',POPULATION,daily_dict(ordinals,cases,tests,True),None,folder=tmp_path)
+
+    cases[100]+=1 # e.g. merged by `--extract-only` without a render: the next render does not see it as changed
+    historical_data=update_history('xx',POPULATION,daily_dict(ordinals,cases,tests,True),np.zeros(0,dtype=np.int32),folder=tmp_path)
+    assert historical_data.updated_rows==slice(0,300)
+    assert_same_table(historical_data.table,full_table(ordinals,cases,tests,True))
@@ -0,0 +1,55 @@
+## Resumable downloads against the replay server (benchmarks/replay_server.py): the connection is dropped within the body and the
+## spooled file has to end up byte-identical to the fixture. Run from the base directory: `python -m pytest tests`
+import pathlib
+import sys
+from types import SimpleNamespace
+import pytest
+
+BASE_DIR = pathlib.Path(__file__).resolve().parent.parent
+for folder in (BASE_DIR,BASE_DIR/'benchmarks'):
+    if str(folder) not in sys.path:
+        sys.path.insert(0,str(folder))
+
+import spooled_download
+from fixtures import fixture_paths
+from replay_server import replay_settings, start_replay_server
+
+@pytest.fixture
+def spool_folder(tmp_path,monkeypatch):
+    monkeypatch.setattr(spooled_download,'SPOOL_FOLDER',tmp_path/'spool')
+    return tmp_path/'spool'
+
+def replay(settings):
+    server,base_url=start_replay_server(settings=settings)
+    return server, SimpleNamespace(url=f'{base_url}/de',ssl_ciphers=None)
+
+def test_dropped_connections_are_resumed(spool_folder):
+    settings=replay_settings(drop_rate=0.7,seed=3)
+    server,country_attributes=replay(settings)
+    try:
+        path,encoding=spooled_download.spool_download(country_attributes,country_attributes.url)
+    finally:
+        server.shutdown()
+
+    assert settings.dropped>0
+    assert settings.requests==settings.dropped+1
+    assert path.read_bytes()==settings.body('de','gzip') # the raw body as sent, so the Range offsets matched
+    with spooled_download.open_spooled(path,encoding) as f:
+        assert f.read()==fixture_paths('de')[0].read_bytes()
+
+def test_partial_file_of_an_earlier_run_is_resumed(spool_folder):
+    settings=replay_settings()
+    server,country_attributes=replay(settings)
+    try:
+        path,encoding=spooled_download.spool_download(country_attributes,country_attributes.url)
+        complete=path.read_bytes()
+        with open(path,'r+b') as f:
+            f.truncate(len(complete)//3)
+        path,encoding=spooled_download.spool_download(country_attributes,country_attributes.url)
+    finally:
+        server.shutdown()
+
+    assert settings.requests==3 # the first download, the answer to the second request and the Range request of the resume
+    assert path.read_bytes()==complete
+    with spooled_download.open_spooled(path,encoding) as f:
+        assert f.read()==fixture_paths('de')[0].read_bytes()
@@ -0,0 +1,253 @@
+## Persistent per-country store of the daily time series. New or revised days are appended, nothing is rewritten
+import csv
+import pathlib
+from datetime import date, timedelta
+import numpy as np
+from loguru import logger
+from columnar_cache import write_columns, open_columns, columns_to_dicts, MISSING
+
+class timeseries_store():
+    def __init__(self,country,contains_tests=False,revision_days=14,folder='download_cache',max_log_days=7):
+        """
+        The store consists of a columnar snapshot (see columnar_cache.py), which is opened with memory mapping, and an append-only
+        csv log with the columns date, cases and tests for all days added or revised after the snapshot. If a day is revised again
+        a new line is appended and the later line wins when the log is loaded. Once the log holds more than `max_log_days` days
+        it is folded into a new snapshot, by `merge` or when the store is loaded. `to_columns` only returns views of the snapshot
+        while the log is empty; with a log the snapshot is copied, so the log is kept short.
+
+        Parameters
+        ----------
+        country : str
+            A two letter color code for a country e.g. 'de' for Germany
+        contains_tests : bool
+            If True the number of tests is stored next to the cases
+        revision_days : int
+            The number of days before the last ingested date which the source might still revise. These days are parsed again on every refresh
+        folder : str
+            The folder containing the store files
+        max_log_days : int
+            The number of distinct days in the log which triggers a new snapshot. A few days: a daily refresh appends one new day
+            and the revised ones, so a warm start usually finds an empty log or a log which is folded right away
+        """
+        self.country=country
+        self.contains_tests=contains_tests
+        self.revision_days=revision_days
+        self.max_log_days=max_log_days
+        self.snapshot_path=pathlib.Path(folder)/f'store_{country}.col'
+        self.path=pathlib.Path(folder)/f'store_{country}.csv'
+        self.ordinals=np.zeros(0,dtype=np.int32)
+        self.cases=np.zeros(0,dtype=np.int64)
+        self.tests=np.zeros(0,dtype=np.int64) if contains_tests else None
+        self.log_cases={}
+        self.log_tests={}
+        self.load()
+
+    def exists(self):
+        """ True if the store was written before """
+        return self.snapshot_path.exists() or self.path.exists()
+
+    def load(self):
+        """
+        Maps the snapshot and replays the log. Later lines overwrite earlier lines of the same date. A log of more than `max_log_days` days is folded into a new snapshot
+        """
+        try:
+            if self.snapshot_path.exists():
+                ordinals,cases,tests=open_columns(self.snapshot_path)
+                self.ordinals,self.cases=ordinals,cases
+                if self.contains_tests:
+                    self.tests=tests if tests is not None else np.full(len(cases),MISSING,dtype=np.int64)
+            if self.path.exists():
+                with open(self.path,'r',newline='') as f:
+                    for row in csv.reader(f):
+                        day=date.fromisoformat(row[0]).toordinal()
+                        self.log_cases[day]=int(row[1])
+                        if self.contains_tests:
+                            self.log_tests[day]=int(row[2]) if len(row)>2 and len(row[2])>0 else None
+                if len(self.log_cases)>self.max_log_days:
+                    self.compact() # the following loads map the snapshot without copying it
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+    def lookup(self,day):
+        """
+        Returns the stored cases and tests of a day
+
+        Parameters
+        ----------
+        day : int
+            A day ordinal
+
+        Returns
+        -------
+        int
+            The cases or None if the day is not stored
+        int
+            The tests or None
+        """
+        if day in self.log_cases:
+            return self.log_cases[day], self.log_tests.get(day)
+        ix=np.searchsorted(self.ordinals,day)
+        if ix<len(self.ordinals) and self.ordinals[ix]==day:
+            tests=None
+            if self.contains_tests and self.tests[ix]!=MISSING:
+                tests=int(self.tests[ix])
+            return int(self.cases[ix]), tests
+        return None, None
+
+    def last_date(self):
+        """
+        Returns
+        -------
+        str
+            The most current date in the store in isoformat or None if the store is empty
+        """
+        last_days=[int(self.ordinals[-1])] if len(self.ordinals)>0 else []
+        if len(self.log_cases)>0:
+            last_days.append(max(self.log_cases))
+        return date.fromordinal(max(last_days)).isoformat() if len(last_days)>0 else None
+
+    def since(self):
+        """
+        Calculates the first date a parser needs to look at. Everything before this date is already in the store and considered final
+
+        Returns
+        -------
+        str
+            A date in isoformat or None if the whole source has to be parsed
+        """
+        last_date=self.last_date()
+        if last_date is None:
+            return None
+        return (date.fromisoformat(last_date)-timedelta(days=self.revision_days)).isoformat()
+
+    def merge(self,ordinals,cases,tests=None):
+        """
+        Merges new or revised days into the store and appends them to the log
+
+        Parameters
+        ----------
+        ordinals : np.ndarray
+            The day ordinals returned by a data preparation method. It may contain only the most recent days
+        cases : np.ndarray
+            The new cases of each day
+        tests : np.ndarray
+            Optional. The tests of each day, missing values are marked with `columnar_cache.MISSING`
+
+        Returns
+        -------
+        np.ndarray
+            A sorted int32 array with the day ordinals which were added or changed
+        """
+        try:
+            changed_days=[]
+            tests_list=tests.tolist() if self.contains_tests and tests is not None else [MISSING]*len(ordinals)
+            for day, day_cases, day_tests in zip(ordinals.tolist(),cases.tolist(),tests_list):
+                day_tests=None if day_tests==MISSING else day_tests
+                stored_cases,stored_tests=self.lookup(day)
+                if stored_cases!=day_cases or (self.contains_tests and stored_tests!=day_tests):
+                    changed_days.append(day)
+                    self.log_cases[day]=day_cases
+                    if self.contains_tests:
+                        self.log_tests[day]=day_tests
+            changed_days.sort()
+
+            self.path.parent.mkdir(exist_ok=True)
+            with open(self.path,'a',newline='') as f:
+                writer=csv.writer(f)
+                for day in changed_days:
+                    writer.writerow(self.create_row(day))
+            self.path.touch() # the modification time marks the last refresh, even if nothing changed
+
+            if len(self.log_cases)>self.max_log_days:
+                self.compact()
+
+            logger.info(f'Store {self.country}: {len(changed_days)} new or revised days, last date {self.last_date()}')
+            return np.array(changed_days,dtype=np.int32)
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+    def create_row(self,day):
+        """ Creates a single log line """
+        if self.contains_tests:
+            tests=self.log_tests.get(day)
+            return [date.fromordinal(day).isoformat(),self.log_cases[day],'' if tests is None else tests]
+        else:
+            return [date.fromordinal(day).isoformat(),self.log_cases[day]]
+
+    def compact(self):
+        """
+        Folds the log into a new snapshot and empties the log
+        """
+        try:
+            ordinals,cases,tests=self.to_columns(reversed_dates=False)
+            # copies: all references to the old memory map are dropped before the snapshot file is replaced
+            self.ordinals,self.cases=np.array(ordinals),np.array(cases)
+            self.tests=np.array(tests) if tests is not None else None
+            del ordinals,cases,tests
+            write_columns(self.snapshot_path,self.ordinals,self.cases,self.tests)
+            open(self.path,'w').close()
+            self.log_cases={}
+            self.log_tests={}
+            self.load()
+
+        except Exception as e:
+            logger.error(e)
+            raise
+
+    def to_columns(self,reversed_dates=True):
+        """
+        Returns the time series as columns. If the log is empty these are (reversed) views of the memory mapped snapshot, so nothing is copied
+
+        Parameters
+        ----------
+        reversed_dates : bool
+            A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
+
+        Returns
+        -------
+        np.ndarray
+            The int32 day ordinals
+        np.ndarray
+            The int64 new cases
+        np.ndarray
+            The int64 tests, missing values are marked with `columnar_cache.MISSING`. None if the country does not publish tests
+        """
+        ordinals,cases,tests=self.ordinals,self.cases,self.tests
+        if len(self.log_cases)>0:
+            log_days=np.fromiter(self.log_cases.keys(),dtype=np.int32,count=len(self.log_cases))
+            log_cases=np.fromiter(self.log_cases.values(),dtype=np.int64,count=len(self.log_cases))
+            keep=~np.isin(ordinals,log_days)
+            ordinals=np.concatenate([ordinals[keep],log_days])
+            cases=np.concatenate([cases[keep],log_cases])
+            order=np.argsort(ordinals,kind='stable')
+            ordinals,cases=ordinals[order],cases[order]
+            if self.contains_tests:
+                log_tests=np.array([MISSING if self.log_tests.get(day) is None else self.log_tests[day] for day in self.log_cases],dtype=np.int64)
+                tests=np.concatenate([tests[keep],log_tests])[order]
+
+        if reversed_dates:
+            ordinals,cases=ordinals[::-1],cases[::-1]
+            tests=tests[::-1] if tests is not None else None
+        return ordinals, cases, tests
+
+    def to_dicts(self,reversed_dates=True):
+        """
+        Creates sorted dictionaries with the dates in isoformat
+
+        Parameters
+        ----------
+        reversed_dates : bool
+            A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+
+        Returns
+        -------
+        dict
+            An ordered dictionary with the dates and new cases
+        dict
+            An ordered dictionary with the dates and tests. None if the country does not publish tests
+        """
+        return columns_to_dicts(*self.to_columns(reversed_dates))
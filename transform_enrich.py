@@ -2,11 +2,18 @@
 import numpy as np
 from loguru import logger
 import sys
-from datetime import datetime, timedelta
+from bisect import bisect_right
+from datetime import date
+from date_normalisation import to_iso
+from column_table import column_table
 
 logger.add(sys.stderr, format="{time} {level} {message}", filter="enrich", level="INFO")
 logger.add(sys.stderr, format="{time} {level} {message}", filter="enrich", level="ERROR")
 
+ROLLING_WINDOWS = (7,14) # the windows of the history columns in days
+NO_CROSSING = -1 # see crossing_days: the threshold is not reached within the simulated days
+COUNT_COLUMNS = ['New Cases','Tests administered','Cases Sum 7d','Tests Sum 7d','Cases Sum 14d','Tests Sum 14d'] # written as integers, all other columns with 2 decimals
+
 class history():
     def calculate_values(self,population,daily_dict,reversed_dates=True):
         """
@@ -18,56 +25,245 @@ class history():
         population : int
             The population of a country
         daily_dict : dict
-            A dictionary containing a list of dates, new cases and optionally the amount of tests for that day
+            A dictionary containing the dates (as day ordinals), new cases and optionally the amount of tests for that day
         reversed_dates : bool
             A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
 
         Returns
         -------
-        list
-            A list of columns containing numerical (smoothened) summary statistics
-        list
-            A second lists of strings containing the column names
+        column_table
+            The table (`self.table`) with the NumPy columns containing numerical (smoothened) summary statistics. `self.table7` and `self.table14`
+            contain only the 7 and 14 day columns (and all columns without a window)
         """
         try:
-            list_of_cases=daily_dict['New Cases']
-            New_Cases_7_Day_Sum=list(rolling_sum(list_of_cases))
-            New_Cases_14_Day_Sum=list(rolling_sum(list_of_cases,interval=14))
-            New_Cases_7_Day_Mean=list(map(lambda x: round(x/7,2) if x is not None else None,New_Cases_7_Day_Sum))
-            New_Cases_14_Day_Mean=list(map(lambda x: round(x/14,2) if x is not None else None,New_Cases_14_Day_Sum))
-            New_Cases_100K_7_Days=list(map(lambda x: round((x/population)*100000,2) if x is not None else None,New_Cases_7_Day_Sum))
-            New_Cases_100K_14_Days=list(map(lambda x: round((x/population)*100000,2) if x is not None else None,New_Cases_14_Day_Sum))
-            Estimated_delta=list(map(lambda x,y: calculateR(x,y),New_Cases_7_Day_Sum,New_Cases_14_Day_Sum))
-            Estimated_R=[round(x**(4/7),2) for x in Estimated_delta if x is not None]
-
-            if daily_dict['Tests'] is not None:                # Since some countries do not publish daily data on tests (looking at you Germany!) I make this calculation optional 
-                # Calculating 7 and 14 day rolling sum for TEST NUMBER
-                Tests_7_Day_Sum=list(rolling_sum(daily_dict['Tests']))
-                Tests_14_Day_Sum=list(rolling_sum(daily_dict['Tests'],interval=14))
-                # Calculating smoothened īpatsvars (positive tests)
-                Positive_rate_7_Days=list(map(lambda x,y: calculateTestPositivity(x,y),New_Cases_7_Day_Sum,Tests_7_Day_Sum))
-                Positive_rate_14_Days=list(map(lambda x,y: calculateTestPositivity(x,y),New_Cases_14_Day_Sum,Tests_14_Day_Sum))
-                Positive_rate_daily=list(map(lambda x,y: calculateTestPositivity(x,y),list_of_cases,daily_dict['Tests']))
-
-                self.data=[daily_dict['Date'],list_of_cases,daily_dict['Tests'],Positive_rate_daily,Estimated_delta,Estimated_R,Positive_rate_7_Days,Positive_rate_14_Days,New_Cases_7_Day_Mean,New_Cases_100K_7_Days,New_Cases_7_Day_Sum,Tests_7_Day_Sum,New_Cases_14_Day_Mean,New_Cases_100K_14_Days,New_Cases_14_Day_Sum,Tests_14_Day_Sum]
-                self.headers=['Date','New Cases','Tests administered','Positive Rate','growth factor','R (estimate)','Positive Rate 7d','Positive Rate 14d','7d mean','Cases/100k 7d','Cases Sum 7d','Tests Sum 7d','14d mean','Cases 100k 14d','Cases Sum 14d','Tests Sum 14d']
-            else:
-                self.data=[daily_dict['Date'],list_of_cases,Estimated_delta,Estimated_R,New_Cases_7_Day_Mean,New_Cases_100K_7_Days,New_Cases_7_Day_Sum,New_Cases_14_Day_Mean,New_Cases_100K_14_Days,New_Cases_14_Day_Sum]
-                self.headers=['Date','New Cases','Growth factor','R (estimate)','7d mean','Cases/100k 7d','Cases Sum 7d','14d mean','Cases/100k 14d','Cases Sum 14d']
+            self.population=population
+            self.reversed_dates=reversed_dates
+            table=self.history_columns(daily_dict['Date'],daily_dict['New Cases'],daily_dict['Tests'])
+
+            # the columns are kept from oldest to most current date in buffers which can grow at the end (see `update_values`). Reversed tables are views
+            self.buffers=[np.array(self.flip(column)) for column in table.columns]
+            self.names=table.names
+            self.days=len(table)
+            self.first_ordinal=int(self.buffers[0][0]) if self.days>0 else None
+            self.updated_rows=slice(0,self.days)
+            return self.set_table()
+
+        except Exception as e:
+            logger.error(e)
+
+    def update_values(self,daily_dict):
+        """
+        Updates the table with new or revised days. Only the rows whose windows contain one of these days are calculated, so the costs depend on the
+        number of days k and not on the length of the series. The other rows and the daily values of the earlier days stay as they are. Requires `calculate_values`
+
+        Parameters
+        ----------
+        daily_dict : dict
+            A dictionary containing the dates (as day ordinals), new cases and optionally the amount of tests of the new or revised days, sorted like the series
+            of `calculate_values`. The days are consecutive and the oldest one is at most one day after the last known day
+
+        Returns
+        -------
+        column_table
+            The updated table (`self.table`, `self.table7` and `self.table14`). `self.updated_rows` is the slice of the rows which have been calculated.
+            None if the update failed, e.g. because the days do not fit to the series. The table then has to be calculated again with `calculate_values`
+        """
+        try:
+            dates=self.flip(np.asarray(daily_dict['Date'],dtype=np.int32))
+            if len(dates)==0:
+                self.updated_rows=slice(0,0)
+                return self.table
+            if np.any(np.diff(dates)!=1):
+                raise ValueError('The updated days have to be consecutive')
+            first=int(dates[0])-self.first_ordinal
+            if first<0 or first>self.days:
+                raise ValueError(f'The update starts on day {first} of a series with {self.days} days')
+            contains_tests='Tests administered' in self.table
+            if contains_tests and daily_dict['Tests'] is None:
+                raise ValueError('The series contains tests, but the update does not')
+
+            days=max(self.days,first+len(dates))
+            self.reserve(days)
+            last=first+len(dates)
+            self.buffers[self.table.index['Date']][first:last]=dates
+            self.buffers[self.table.index['New Cases']][first:last]=self.flip(np.asarray(daily_dict['New Cases']))
+            if contains_tests:
+                self.buffers[self.table.index['Tests administered']][first:last]=self.flip(np.asarray(daily_dict['Tests'],dtype=np.float64))
+
+            # the rows from `first` on are calculated from the daily values of these rows and the complete windows before them
+            start=max(0,first-max(ROLLING_WINDOWS))
+            inputs=[self.flip(self.buffers[self.table.index[name]][start:days]) for name in ('Date','New Cases','Tests administered') if name in self.table]
+            table=self.history_columns(*inputs)
+            for buffer,column in zip(self.buffers,table.columns):
+                buffer[first:days]=self.flip(column)[first-start:]
+
+            self.days=days
+            self.updated_rows=slice(0,days-first) if self.reversed_dates else slice(first,days)
+            return self.set_table()
+
+        except Exception as e:
+            logger.error(e)
+
+    def history_columns(self,dates,cases,tests=None):
+        """
+        Calculates all columns of the table for a series, sorted like `self.reversed_dates`
+
+        Parameters
+        ----------
+        dates : np.ndarray
+            The day ordinals
+        cases : np.ndarray
+            The new cases
+        tests : np.ndarray
+            Optional. The tests, NaN where they are missing. None if the source does not publish tests
+
+        Returns
+        -------
+        column_table
+            The columns
+        """
+        # all columns are NumPy arrays. Values which can not be calculated (yet) are NaN; rounding happens when the table is written (see `to_output`)
+        population=self.population
+        dates=np.asarray(dates,dtype=np.int32)
+        daily_cases=np.asarray(cases)
+        case_sums=rolling_sums(daily_cases,ROLLING_WINDOWS,reversed_dates=self.reversed_dates)
+        New_Cases_7_Day_Sum=case_sums[7]
+        New_Cases_14_Day_Sum=case_sums[14]
+        New_Cases_7_Day_Mean=New_Cases_7_Day_Sum/7
+        New_Cases_14_Day_Mean=New_Cases_14_Day_Sum/14
+        New_Cases_100K_7_Days=(New_Cases_7_Day_Sum/population)*100000
+        New_Cases_100K_14_Days=(New_Cases_14_Day_Sum/population)*100000
+        Estimated_delta=(New_Cases_7_Day_Sum+5)/(New_Cases_14_Day_Sum-New_Cases_7_Day_Sum+5) # see calculateR
+        Estimated_R=Estimated_delta**(4/7)
+
+        if tests is not None:                # Since some countries do not publish daily data on tests (looking at you Germany!) I make this calculation optional 
+            # Calculating 7 and 14 day rolling sum for TEST NUMBER. Missing tests are NaN and so is every window containing them
+            tests=np.asarray(tests,dtype=np.float64)
+            test_sums=rolling_sums(tests,ROLLING_WINDOWS,reversed_dates=self.reversed_dates)
+            Tests_7_Day_Sum=test_sums[7]
+            Tests_14_Day_Sum=test_sums[14]
+            # Calculating smoothened īpatsvars (positive tests)
+            Positive_rate_7_Days=positivity(New_Cases_7_Day_Sum,Tests_7_Day_Sum)
+            Positive_rate_14_Days=positivity(New_Cases_14_Day_Sum,Tests_14_Day_Sum)
+            Positive_rate_daily=positivity(daily_cases,tests)
+
+            return column_table(['Date','New Cases','Tests administered','Positive Rate','growth factor','R (estimate)','Positive Rate 7d','Positive Rate 14d','7d mean','Cases/100k 7d','Cases Sum 7d','Tests Sum 7d','14d mean','Cases 100k 14d','Cases Sum 14d','Tests Sum 14d'],
+                [dates,daily_cases,tests,Positive_rate_daily,Estimated_delta,Estimated_R,Positive_rate_7_Days,Positive_rate_14_Days,New_Cases_7_Day_Mean,New_Cases_100K_7_Days,New_Cases_7_Day_Sum,Tests_7_Day_Sum,New_Cases_14_Day_Mean,New_Cases_100K_14_Days,New_Cases_14_Day_Sum,Tests_14_Day_Sum])
+        else:
+            return column_table(['Date','New Cases','Growth factor','R (estimate)','7d mean','Cases/100k 7d','Cases Sum 7d','14d mean','Cases/100k 14d','Cases Sum 14d'],
+                [dates,daily_cases,Estimated_delta,Estimated_R,New_Cases_7_Day_Mean,New_Cases_100K_7_Days,New_Cases_7_Day_Sum,New_Cases_14_Day_Mean,New_Cases_100K_14_Days,New_Cases_14_Day_Sum])
+
+    def flip(self,column):
+        """ Reverses a column if the table is sorted from most current to oldest date. Turns table order into buffer order and back """
+        return column[::-1] if self.reversed_dates else column
+
+    def reserve(self,days):
+        """ Makes room for `days` rows in the buffers. Full buffers are doubled, so appending days costs amortised O(1) per day """
+        capacity=len(self.buffers[0])
+        if days>capacity:
+            capacity=max(days,2*capacity)
+            for ix,buffer in enumerate(self.buffers):
+                grown=np.empty(capacity,dtype=buffer.dtype)
+                grown[:self.days]=buffer[:self.days]
+                self.buffers[ix]=grown
+
+    def set_table(self):
+        """ Creates `self.table`, `self.table7` and `self.table14` as views of the first `self.days` rows of the buffers """
+        self.table=column_table(self.names,[self.flip(buffer[:self.days]) for buffer in self.buffers])
+
+        ## The 7 and 14 day calculations share the columns of the table
+        self.table7=self.table.window('7d')
+        self.table14=self.table.window('14d')
+        return self.table
+
+    def calculate_regional_values(self,regions,reversed_dates=True):
+        """
+        Calculates the rolling statistics of `calculate_values` for all regions at once. Each statistic is a (region x day) matrix,
+        computed with one cumulative sum over the day axis instead of one pass per region. Values which can not be calculated yet are NaN and nothing is rounded (see `to_output`).
+        The cases per 100k are only calculated if the source publishes the population of each region
 
-            ## Select all 7 day calculations from smoothened_list
-            self.headers7=list(filter(lambda x: x.find('14d')<0,self.headers)) # Idea about x.find(): anything not containing the 14d calculations needs to be kept
-            self.data7 = [x for x, y in zip(self.data, self.headers) if y.find('14d')<0]
+        Parameters
+        ----------
+        regions : regional_matrix
+            The regional matrices of a source, see regional_matrix.py
+        reversed_dates : bool
+            A boolean which is true if the columns should be sorted from most current to oldest date. If False they are sorted from oldest to most current date.
 
-            ## Select all 14 day calculations from smoothened_list
-            self.headers14 = list(filter(lambda x: x.find('7d')<0, self.headers)) # Idea about x.find(): anything not containing the 7d calculations needs to be kept
-            self.data14 = [x for x, y in zip(self.data, self.headers) if y.find('7d')<0]
+        Returns
+        -------
+        column_table
+            A table of (region x day) matrices (`self.regional_table`). The region names are in `self.regions`
+        """
+        try:
+            cases=regions.cases[:,::-1] if reversed_dates else regions.cases
+            ordinals=regions.ordinals[::-1] if reversed_dates else regions.ordinals
+            sum7,sum14=rolling_sums(cases,ROLLING_WINDOWS,reversed_dates=reversed_dates).values()
+            growth_factor=(sum7+5)/(sum14-sum7+5)        # see calculateR
+            regional_data=[cases,growth_factor,growth_factor**(4/7),sum7/7,sum7,sum14/14,sum14]
+            regional_headers=['New Cases','Growth factor','R (estimate)','7d mean','Cases Sum 7d','14d mean','Cases Sum 14d']
+
+            if regions.populations is not None:
+                per100k=100000/regions.populations[:,None]
+                regional_data+=[sum7*per100k,sum14*per100k]
+                regional_headers+=['Cases/100k 7d','Cases/100k 14d']
+
+            if regions.tests is not None:
+                tests=regions.tests[:,::-1] if reversed_dates else regions.tests
+                tests7,tests14=rolling_sums(tests,ROLLING_WINDOWS,reversed_dates=reversed_dates).values()
+                regional_data+=[tests,positivity(cases,tests),positivity(sum7,tests7),positivity(sum14,tests14),tests7,tests14]
+                regional_headers+=['Tests administered','Positive Rate','Positive Rate 7d','Positive Rate 14d','Tests Sum 7d','Tests Sum 14d']
+
+            self.regional_table=column_table(regional_headers,regional_data)
+            self.regions=regions.regions
+            self.regional_dates=ordinals
+            return self.regional_table
 
         except Exception as e:
             logger.error(e)
 
 ## the following functions are utility functions 
 
+def positivity(new_cases,new_tests):
+    """
+    Vectorised `calculateTestPositivity`: the percentage of positive tests for whole columns. Days without tests are NaN
+
+    Parameters
+    ----------
+    new_cases : np.ndarray
+        The (new) cases
+    new_tests : np.ndarray
+        The (new) tests
+
+    Returns
+    -------
+    np.ndarray
+        The percentages
+    """
+    with np.errstate(divide='ignore',invalid='ignore'):
+        return np.where(new_tests==0,np.nan,(new_cases/new_tests)*100)
+
+def to_output(column,decimals=2):
+    """
+    Converts a column to a list for the html/json output. This is the only place where values are rounded
+
+    Parameters
+    ----------
+    column : np.ndarray
+        A numerical column
+    decimals : int
+        Optional. The number of decimals. If 0 the values are written as integers
+
+    Returns
+    -------
+    list
+        A list of python numbers with None for NaN
+    """
+    values=np.asarray(column,dtype=np.float64)
+    missing=np.isnan(values).tolist()
+    if decimals==0:
+        return [None if is_missing else int(x) for x,is_missing in zip(values.tolist(),missing)]
+    return [None if is_missing else round(x,decimals) for x,is_missing in zip(values.tolist(),missing)]
+
 def calculateTestPositivity(new_cases,new_tests):
     """
     Calculates how many tests where positive
@@ -122,40 +318,269 @@ def calculateR(last7days_cases,last14days_cases,constant_int=5):
     except Exception as e:
         logger.error(e)
 
-def rolling_sum(list_of_cases,interval=7,reversed_dates=True):
+def rolling_sums(values,windows=(7,14),reversed_dates=True,fill=np.nan):
     """
-    Calculates the rolling sum over a specified interval
+    Calculates rolling sums over several windows from one cumulative sum. Works on the last axis of a series or of every row of a (region x day) matrix.
+    If the dates are sorted from oldest to most current date, position i holds the sum of the `window` days up to and including day i, except for the first `window` days.
+    If they are reversed, position i holds the sum of the `window` days before day i
 
     Parameters
     ----------
-    list of cases : list
-        The list of cases
-    interval : int
-        An integer indicating over which period the rolling sum should be taken
+    values : np.ndarray
+        A series or a (region x day) matrix. Integer input is summed exactly in int64. NaN in float input marks missing values and every window containing one is NaN
+    windows : tuple
+        Optional. The window lengths in days e.g. (7,14,28)
     reversed_dates : bool
-        A boolean which is true if the result dictionary should be sorted from most current to oldest date. If False the dictionary is sorted from oldest to most current date.
+        A boolean which is true if the days are sorted from most current to oldest date
+    fill : number
+        Optional. The value of the positions without a complete window. The result keeps the dtype of the sums (int64 or the float dtype of the input) unless `fill`
+        does not fit, e.g. the default NaN turns integer sums into float64
+
+    Returns
+    -------
+    dict
+        The window as key and an array with the shape of `values` as value
+    """
+    values=np.asarray(values)
+    cumulated_missing=None
+    if values.dtype.kind=='f':
+        missing=np.isnan(values)
+        if missing.any():
+            values=np.where(missing,0,values)
+            cumulated_missing=np.cumsum(missing,axis=-1,dtype=np.int64)
+        cumulated_sum=np.cumsum(values,axis=-1)
+    else:
+        cumulated_sum=np.cumsum(values,axis=-1,dtype=np.int64)
+    dtype=np.result_type(cumulated_sum.dtype,np.min_scalar_type(fill))
+
+    results={}
+    for window in windows:
+        result=np.full(values.shape,fill,dtype=dtype)
+        if values.shape[-1]>window:
+            sums=cumulated_sum[...,window:]-cumulated_sum[...,:-window]
+            if cumulated_missing is not None:
+                sums=np.where(cumulated_missing[...,window:]-cumulated_missing[...,:-window]>0,np.nan,sums)
+            if reversed_dates:
+                result[...,:-window]=sums
+            else:
+                result[...,window:]=sums
+        results[window]=result
+    return results
+
+def crossing_days(trajectories,thresholds,first_day=0,below=True):
+    """
+    Finds for every threshold and trajectory the first day on which the trajectory is below (or above) the threshold.
+    Monotone trajectories, like the linear scenarios of `simulate`, are solved with one bisection for all thresholds and trajectories; the others with array comparisons
 
+    Parameters
+    ----------
+    trajectories : np.ndarray
+        A (trajectory x day) matrix e.g. the simulated cases per 100k of each R
+    thresholds : list
+        The thresholds
+    first_day : int
+        Optional. The first day to look at e.g. 7 to skip the days without a complete 7 day window
+    below : bool or np.ndarray
+        Optional. True to look for values below the threshold, False for values above. A (threshold x trajectory) boolean matrix sets the direction per pair
 
     Returns
     -------
-    list
-        A list of rolling sums. Be aware that this list is exactly the `interval` amount shorter than `list_of_cases`
+    np.ndarray
+        A (threshold x trajectory) int matrix with the day (counted from the start of the trajectories) or `NO_CROSSING` if the threshold is not reached
     """
-    try:
-        cumulated_sum=[int(x) for x in np.cumsum(list_of_cases,dtype=int)]      # needed for json convertability
-        rolling_sum=[cumulated_sum[i+interval]-cumulated_sum[i] for i in range(0,len(cumulated_sum)-interval)]
-        # rolling_sum=list(cumulated_sum[interval:]-cumulated_sum[:-interval])
-        if reversed_dates:
-            emptyItems=list(np.repeat(None,interval))
-            rolling_sum.extend(emptyItems)
-            return rolling_sum
-        else:
-            result=list(np.repeat(None,interval))
-            result.extend(rolling_sum)
-            return result
+    trajectories=np.atleast_2d(np.asarray(trajectories,dtype=np.float64))[:,first_day:]
+    thresholds=np.asarray(thresholds,dtype=np.float64)
+    below=np.broadcast_to(np.asarray(below,dtype=bool),(len(thresholds),len(trajectories)))
+    days=np.full((len(thresholds),len(trajectories)),NO_CROSSING,dtype=np.int64)
+    if trajectories.shape[1]==0:
+        return days
+
+    steps=np.diff(trajectories,axis=1)
+    increasing=(steps>=0).all(axis=1)
+    decreasing=(steps<=0).all(axis=1)&~increasing
+    length=trajectories.shape[1]
+
+    # monotone trajectories: a bisection for all thresholds and trajectories at once finds the first day beyond the threshold in the direction of the slope.
+    # In the other direction they are beyond the threshold from the first day on or never
+    monotone=np.flatnonzero(increasing|decreasing)
+    if len(monotone)>0:
+        sign=np.where(increasing[monotone],1.0,-1.0)[None,:]
+        signed_thresholds=sign*thresholds[:,None]
+        low=np.zeros((len(thresholds),len(monotone)),dtype=np.int64)
+        high=np.full(low.shape,length)
+        searching=low<high
+        while searching.any():
+            middle=(low+high)//2
+            beyond=sign*trajectories[monotone[None,:],np.minimum(middle,length-1)]>signed_thresholds
+            low=np.where(searching&~beyond,middle+1,low)
+            high=np.where(searching&beyond,middle,high)
+            searching=low<high
+        along_slope=np.where(low<length,low,NO_CROSSING)
+        first_values=trajectories[monotone,0][None,:]
+        above_day=np.where(increasing[monotone][None,:],along_slope,np.where(first_values>thresholds[:,None],0,NO_CROSSING))
+        below_day=np.where(decreasing[monotone][None,:],along_slope,np.where(first_values<thresholds[:,None],0,NO_CROSSING))
+        days[:,monotone]=np.where(below[:,monotone],below_day,above_day)
+
+    for ix in np.flatnonzero(~(increasing|decreasing)):
+        trajectory=trajectories[ix]
+        above=trajectory[None,:]>thresholds[:,None]
+        below_values=trajectory[None,:]<thresholds[:,None]
+        above_day=np.where(above.any(axis=1),above.argmax(axis=1),NO_CROSSING)
+        below_day=np.where(below_values.any(axis=1),below_values.argmax(axis=1),NO_CROSSING)
+        days[:,ix]=np.where(below[:,ix],below_day,above_day)
+    return np.where(days==NO_CROSSING,NO_CROSSING,days+first_day)
+
+def generation_interval(mean=4,sd=2,max_days=14):
+    """
+    A discretised gamma distribution of the days between an infection and the infections it causes. The default mean of 4 days matches R=growth factor**(4/7) of `calculateR`
 
-    except Exception as e:
-        logger.error(e)
+    Parameters
+    ----------
+    mean : float
+        Optional. The mean generation time in days
+    sd : float
+        Optional. The standard deviation in days
+    max_days : int
+        Optional. The longest generation time
+
+    Returns
+    -------
+    np.ndarray
+        The weights of the lags 0 to `max_days`. The weight of lag 0 is 0 and the weights sum up to 1
+    """
+    shape=(mean/sd)**2
+    scale=sd**2/mean
+    lags=np.arange(1,max_days+1)
+    weights=lags**(shape-1)*np.exp(-lags/scale)
+    return np.concatenate([[0.0],weights/weights.sum()])
+
+def fft_convolve(a,b,length):
+    """ The linear convolution of the last axes of `a` and `b`, truncated to `length` values. Computed by FFT, so long series are cheap """
+    size=1<<(a.shape[-1]+b.shape[-1]-2).bit_length()
+    return np.fft.irfft(np.fft.rfft(a,size)*np.fft.rfft(b,size),size)[...,:length]
+
+def renewal_cases(R_range,past_cases,days,generation=None):
+    """
+    Projects the daily cases with the renewal equation I(t) = R * sum_s w(s) * I(t-s) for every R.
+    The solution is the inverse power series of 1-R*W(z) applied to the infections caused by the past cases, computed with FFT convolutions.
+    The series are tilted with the growth rate of each R (Euler-Lotka equation), so growing and shrinking scenarios are calculated with the same precision
+
+    Parameters
+    ----------
+    R_range : list
+        The assumed effective R-values, one scenario each
+    past_cases : np.ndarray
+        The daily cases before the first simulated day, sorted from oldest to most current date
+    days : int
+        The number of days to simulate
+    generation : np.ndarray
+        Optional. The generation interval weights by lag, see `generation_interval`
+
+    Returns
+    -------
+    np.ndarray
+        The (R x day) matrix of simulated daily cases
+    """
+    generation=generation_interval() if generation is None else np.asarray(generation,dtype=np.float64)
+    R=np.asarray(R_range,dtype=np.float64)[:,None]
+    lags=np.arange(len(generation))
+
+    # growth rate r of each R: R*sum_s w(s)*exp(-r*s)=1, the left side falls with r
+    low=np.full(R.shape,-2.0)
+    high=np.full(R.shape,2.0)
+    for _ in range(60):
+        rate=(low+high)/2
+        too_low=(R*(generation*np.exp(-rate*lags)).sum(axis=1,keepdims=True))>1
+        low=np.where(too_low,rate,low)
+        high=np.where(too_low,high,rate)
+    rate=(low+high)/2
+    kernel=R*generation*np.exp(-rate*lags)              # the tilted kernel sums up to 1
+
+    # infections on the simulated days which are caused by the past cases
+    past=np.asarray(past_cases,dtype=np.float64)[-(len(generation)-1):]
+    caused=np.convolve(past,generation)[len(past):len(past)+len(generation)-1]
+    forcing=R*caused[None,:]*np.exp(-rate*np.arange(len(caused)))
+
+    # inverse of the power series 1-kernel(z) by Newton iteration: inverse=inverse*(2-series*inverse), doubling the known terms each step
+    series=np.zeros((len(R),max(days,len(generation))))
+    series[:,:len(generation)]=-kernel
+    series[:,0]+=1
+    inverse=np.ones((len(R),1))
+    known=1
+    while known<days:
+        known=min(2*known,days)
+        correction=-fft_convolve(series[:,:known],inverse,known)
+        correction[:,0]+=2
+        inverse=fft_convolve(inverse,correction,known)
+
+    tilted=fft_convolve(inverse,forcing,days)
+    return tilted*np.exp(rate*np.arange(days))
+
+def schedule_matrix(schedules,days):
+    """
+    Expands piecewise constant R schedules into a (schedule x day) matrix
+
+    Parameters
+    ----------
+    schedules : list
+        One list of (start day, R) segments per schedule, e.g. [[(0,1.2),(14,0.85)],[(0,0.9)]] for R=1.2 during two weeks followed by 0.85 and a constant 0.9.
+        Each R holds until the next segment starts; the first segment starts on day 0
+    days : int
+        The number of days
+
+    Returns
+    -------
+    np.ndarray
+        The R of each schedule and day
+    """
+    segments=[sorted(schedule) for schedule in schedules]
+    for schedule in segments:
+        starts=[start for start,_ in schedule]
+        if len(schedule)==0 or starts[0]!=0 or len(set(starts))<len(starts):
+            raise ValueError(f'A schedule needs segments with distinct start days, the first on day 0: {schedule}')
+    values=np.zeros((len(segments),max(len(schedule) for schedule in segments)))
+    segment=np.zeros((len(segments),days),dtype=np.int64)
+    for row,schedule in enumerate(segments):
+        values[row,:len(schedule)]=[R for _,R in schedule]
+        segment[row]=np.searchsorted([start for start,_ in schedule],np.arange(days),side='right')-1
+    return np.take_along_axis(values,segment,axis=1)
+
+def schedule_label(schedule):
+    """ Names a schedule for the tables e.g. '1.2, 0.85 from day 14'. A constant schedule is named by its R """
+    schedule=sorted(schedule)
+    if len(schedule)==1:
+        return schedule[0][1]
+    return ', '.join([str(schedule[0][1])]+[f'{R} from day {start}' for start,R in schedule[1:]])
+
+def renewal_schedule_cases(R_matrix,past_cases,generation=None):
+    """
+    Projects the daily cases with the renewal equation like `renewal_cases`, but with an R for every day. The days are calculated one after another,
+    each for all schedules at once (the FFT solution of `renewal_cases` requires a constant R)
+
+    Parameters
+    ----------
+    R_matrix : np.ndarray
+        The (schedule x day) R, see `schedule_matrix`
+    past_cases : np.ndarray
+        The daily cases before the first simulated day, sorted from oldest to most current date
+    generation : np.ndarray
+        Optional. The generation interval weights by lag, see `generation_interval`
+
+    Returns
+    -------
+    np.ndarray
+        The (schedule x day) matrix of simulated daily cases
+    """
+    generation=generation_interval() if generation is None else np.asarray(generation,dtype=np.float64)
+    R_matrix=np.atleast_2d(np.asarray(R_matrix,dtype=np.float64))
+    lags=len(generation)-1
+    past=np.asarray(past_cases,dtype=np.float64)[-lags:]
+    cases=np.zeros((len(R_matrix),lags+R_matrix.shape[1]))
+    cases[:,lags-len(past):lags]=past
+    weights=generation[:0:-1]                             # the weights of the lags `lags` to 1, aligned with the previous days
+    for day in range(R_matrix.shape[1]):
+        cases[:,lags+day]=R_matrix[:,day]*(cases[:,day:lags+day]@weights)
+    return cases[:,lags:]
 
 class simulate():
     def __init__(self,new_cases_assumed,population,R_range=[0.8,0.85,0.9,0.95,1.05,1.1,1.15,1.2],thresholds=[10,20,50,100,200,400,600,800,1000],new_cases_assumed14=None):
@@ -197,35 +622,33 @@ class simulate():
             # Step 1: Calculate the index where a threshold is above the current cases per 100k - do it for both 7 and 14 days
             current_cases100k_7d=((self.input_new_cases_avg*7)/self.input_population)*100000 # quite accurate
             current_cases100k_14d=((self.input_new_cases_avg14*7)/self.input_population)*100000 # might be inaccurate if no 14d value was supplied
-            th_list=self.input_thresholds
-            th_above_current100k_7d=next((i for i in range(0,len(th_list)) if sorted(th_list)[i]>current_cases100k_7d),len(th_list))
-            th_above_current100k_14d=next((i for i in range(0,len(th_list)) if sorted(th_list)[i]>current_cases100k_14d),len(th_list))
+            th_list=sorted(self.input_thresholds)
+            th_above_current100k_7d=bisect_right(th_list,current_cases100k_7d)
+            th_above_current100k_14d=bisect_right(th_list,current_cases100k_14d)
             
             # Step 2: Use this index to create below and above threshold lists for both 7 and 14 day calculations
-            self.th_above7=sorted(th_list)[th_above_current100k_7d:]
-            self.th_above14=sorted(th_list)[th_above_current100k_14d:]
-            self.th_below7=sorted(th_list)[:th_above_current100k_7d]
-            self.th_below14=sorted(th_list)[:th_above_current100k_14d]
-
-            # Step 3: Create two lists one with R values above 1 and another with R values below 1
-            delta_range=self.input_delta_range
-            firstR_over1_i=next((i for i in range(0,len(delta_range)) if sorted(delta_range)[i]>1),len(delta_range))
-            delta_below=sorted(delta_range)[:firstR_over1_i]        # contains only growth rates below 1
-            delta_above=sorted(delta_range)[firstR_over1_i:]        # contains only growth rates above 1
-            r_below=sorted(self.input_r_range)[:firstR_over1_i]
-            r_above=sorted(self.input_r_range)[firstR_over1_i:]
+            self.th_above7=th_list[th_above_current100k_7d:]
+            self.th_above14=th_list[th_above_current100k_14d:]
+            self.th_below7=th_list[:th_above_current100k_7d]
+            self.th_below14=th_list[:th_above_current100k_14d]
+
+            # Step 3: Split the scenarios into those ending with R below (or at) 1 and those ending above 1
+            rows_below=np.flatnonzero(self.scenario_final_R<=1)      # contains only growth rates below 1
+            rows_above=np.flatnonzero(self.scenario_final_R>1)       # contains only growth rates above 1
+            r_below=[self.scenario_labels[row] for row in rows_below]
+            r_above=[self.scenario_labels[row] for row in rows_above]
             
             # Step 4: Use Steps 3  and  2 to create value lists for all 4 possible cases
-            self.values7_above_th=self.get_th_list(self.th_above7,delta_above,r_above,below=False) if len(delta_above)>0 and len(self.th_above7)>0 else None
-            self.values14_above_th=self.get_th_list(self.th_above14,delta_above,r_above,d7=False,below=False) if len(delta_above)>0 and len(self.th_above14)>0 else None
-            self.values7_below_th=self.get_th_list(self.th_below7,delta_below,r_below) if len(delta_below)>0 and len( self.th_below7)>0 else None
-            self.values14_below_th=self.get_th_list(self.th_below14,delta_below,r_below,d7=False)  if len(delta_below)>0  and len( self.th_below14)>0 else None
+            self.values7_above_th=self.get_th_list(self.th_above7,rows_above,r_above,below=False) if len(rows_above)>0 and len(self.th_above7)>0 else None
+            self.values14_above_th=self.get_th_list(self.th_above14,rows_above,r_above,d7=False,below=False) if len(rows_above)>0 and len(self.th_above14)>0 else None
+            self.values7_below_th=self.get_th_list(self.th_below7,rows_below,r_below) if len(rows_below)>0 and len( self.th_below7)>0 else None
+            self.values14_below_th=self.get_th_list(self.th_below14,rows_below,r_below,d7=False)  if len(rows_below)>0  and len( self.th_below14)>0 else None
             # in_FC_cases_per100k_7d - dict
 
         except Exception as e:
             logger.error(e)
 
-    def get_th_list(self,th_list,growth_list,r_list,d7=True,below=True):
+    def get_th_list(self,th_list,rows,r_list,d7=True,below=True):
         """
         Calculates after how many days a threshold is reached. Can only be executed after simulate_new_cases
         
@@ -233,10 +656,10 @@ class simulate():
         ----------
         th_list : list
             list of thresholds to verify. This list corresponds to d7 and below input
-        r_list : float
-            list of assumed assumed R values. Either only R values above or below 1; corresponds thus to below
-        growth_list : float
-            list of assumed growth rates, gained from the assumed R values in the class method. Either only growth rates above or below 1; corresponds thus to below
+        rows : np.ndarray
+            The rows of the simulated scenarios. Either only scenarios ending with R above or below 1; corresponds thus to below
+        r_list : list
+            The labels of these scenarios, the assumed R values or the R schedules
         d7 : bool
             Is the  a calculation over 7 or 14 days?
         below : bool
@@ -244,149 +667,185 @@ class simulate():
 
         Returns
         -------
-        int
-            An index indicating the number of days until the threshold is reached
+        list
+            The R values followed by one list per threshold with the number of days until the threshold is reached (None if it is not reached)
         """
         try:
-            FC_dict=self.in_FC_cases_per100k_7d if d7 else self.in_FC_cases_per100k_14d
-            res=[r_list]
-            for th in th_list:
-                res.append([self.get_th_days(FC_dict[delta_s],th,d7,below) for delta_s in growth_list])
-            return res
+            interval=7 if d7 else 14
+            matrix=self.per100k_7d_matrix if d7 else self.per100k_14d_matrix
+            days=crossing_days(matrix[rows],th_list,first_day=interval,below=below)
+            return [r_list]+[[None if day==NO_CROSSING else day for day in th_days] for th_days in days.tolist()]
             
         except Exception as e:
             logger.error(e)
-    
-    def get_th_days(self,fc_list,th,d7,below):
+
+    def simulate_new_cases(self,output_limit=91,window_length=1000,return_threshold_days=True): #new
         """
-        Calculates after how many days a threshold is reached
+        Simulates daily new cases (in general and per 100k) according to a specified range of R; adds Date column
         
         Parameters
         ----------
-        fc_list : list
-            the simulated cases per 100k
-        th : int
-            The threshold to look for
-        d7 : bool
-            Is the fc_list a calculation over 7 or 14 days?
-        below : bool
-            Is the threshold below or above the current cases per 100k?
+        output_length : int
+            The amount of days to forecast (default is 91)
+        window_length : int
+            The amount of days to check where a threshold migth be reached
+        return_threshold_days : bool
+            Whether to calculate threshold days or not
 
         Returns
         -------
-        int
-            An index indicating the number of days until the threshold is reached
+        list
+            The dates followed by one array of simulated new cases per assumed effective R-value
+        list
+            The dates followed by one array of the cases per 100k KPI for 7 days per assumed effective R-value
+        list
+            The dates followed by one array of the cases per 100k KPI for 14 days per assumed effective R-value
+
+        The (growth factor x day) matrices behind these lists are `self.cases_matrix`, `self.per100k_7d_matrix` and `self.per100k_14d_matrix`,
+        the growth factors of the rows are in `self.delta_range`
         """
         try:
-            interval=7 if d7 else 14
-            fc=fc_list[interval:]
-            if below:
-                return next((x[0]+interval for x in enumerate(fc) if x[1] < th),None)
-            else:
-                return next((x[0]+interval for x in enumerate(fc) if x[1] > th),None)
+            # one row per growth factor: the linear ramp of the daily cases is calculated for all scenarios at once
+            self.delta_range=np.sort(np.asarray(self.input_delta_range,dtype=np.float64))
+            step_values=(self.delta_range-1)/7
+            cases_matrix=(1+step_values[:,None]*np.arange(window_length))*self.input_new_cases_avg
+            self.store_scenarios(cases_matrix,return_threshold_days)
 
         except Exception as e:
             logger.error(e)
 
-    def simulate_new_cases(self,output_limit=91,window_length=1000,return_threshold_days=True): #new
+    def simulate_renewal_cases(self,past_cases=None,generation=None,window_length=1000,return_threshold_days=True):
         """
-        Simulates daily new cases (in general and per 100k) according to a specified range of R; adds Date column
-        
+        Alternative to `simulate_new_cases`: simulates daily new cases with the renewal equation (see `renewal_cases`) instead of a linear ramp.
+        Fills the same attributes, so the threshold tables work with both
+
         Parameters
         ----------
-        output_length : int
-            The amount of days to forecast (default is 91)
+        past_cases : np.ndarray
+            Optional. The daily cases of the last days, sorted from oldest to most current date. Defaults to the current 7 day mean on each day
+        generation : np.ndarray
+            Optional. The generation interval weights by lag, see `generation_interval`
         window_length : int
             The amount of days to check where a threshold migth be reached
         return_threshold_days : bool
             Whether to calculate threshold days or not
-
-        Returns
-        -------
-        list
-            A list of simulated new cases for each day based on a range of assumed effective R-values
-        list
-            A list of the cases per 100k KPI for 7 days based on a range of assumed effective R-values
-        list
-            A list of the cases per 100k KPI for 14 days based on a range of assumed effective R-values
         """
         try:
-            # create range of dates and insert it at the beginning of the list
-            base = datetime.today()
-            date_list = [(base + timedelta(days=x)).date().isoformat() for x in range(window_length)]
-
-            self.cases_new=[date_list]
-            self.casesPer100k_7d=[date_list]
-            self.casesPer100k_14d=[date_list]
-            self.in_FC_cases_per100k_7d={}
-            self.in_FC_cases_per100k_14d={}
-            for delta_s in sorted(self.input_delta_range):
-                step_value=(delta_s-1)/7
-                new_cases=np.arange(start=1,stop=1+(step_value*window_length),step=step_value)*self.input_new_cases_avg
-                New_Cases_7_Day_Sum=rolling_sum(new_cases,interval=7,reversed_dates=False)
-                New_Cases_14_Day_Sum=rolling_sum(new_cases,interval=14,reversed_dates=False)
-                self.in_FC_cases_per100k_7d[delta_s]=list(map(lambda x: round((x/self.input_population)*100000,2) if x is not None else None,New_Cases_7_Day_Sum))
-                self.in_FC_cases_per100k_14d[delta_s]=list(map(lambda x: round((x/self.input_population)*100000,2) if x is not None else None,New_Cases_14_Day_Sum))
-                                        
-                # append cases for simulated
-                self.cases_new.append(list(np.round(new_cases,2)))
-                self.casesPer100k_7d.append(self.in_FC_cases_per100k_7d[delta_s])
-                self.casesPer100k_14d.append(self.in_FC_cases_per100k_14d[delta_s])
-
-
-            # calculates after how many days under an assumed R_0 a threshold is reached.
-            if return_threshold_days:
-                self.threshold_days7=[self.input_r_range]
-                self.threshold_days14=[self.input_r_range]
-            
-                for th in self.input_thresholds:                    
-                    threshold_days_list7=[self.verify_threshold(self.in_FC_cases_per100k_7d[delta_s],th,interval=7) for delta_s in self.input_delta_range]
-                    self.threshold_days7.append(threshold_days_list7)
-                    threshold_days_list14=[self.verify_threshold(self.in_FC_cases_per100k_14d[delta_s],th,interval=14) for delta_s in self.input_delta_range]
-                    self.threshold_days14.append(threshold_days_list14)
+            generation=generation_interval() if generation is None else generation
+            if past_cases is None:
+                past_cases=np.full(len(generation)-1,self.input_new_cases_avg,dtype=np.float64)
+            self.delta_range=np.sort(np.asarray(self.input_delta_range,dtype=np.float64))
+            cases_matrix=renewal_cases(self.input_r_range,past_cases,window_length,generation) # input_r_range is sorted like delta_range
+            self.store_scenarios(cases_matrix,return_threshold_days)
 
         except Exception as e:
             logger.error(e)
 
+    def simulate_schedules(self,schedules,engine='linear',past_cases=None,generation=None,window_length=1000,return_threshold_days=True):
+        """
+        Simulates scenarios in which R changes over time, e.g. R=1.2 during two weeks followed by 0.85 after an intervention. All schedules are
+        calculated at once and fill the same attributes as `simulate_new_cases`, so the threshold tables (`create_th_values`) work with them
+
+        Parameters
+        ----------
+        schedules : list
+            One list of (start day, R) segments per scenario, see `schedule_matrix`
+        engine : str
+            Optional. 'linear' (default) continues the linear trend of `simulate_new_cases` with the slope of the current R;
+            'renewal' uses the renewal equation of `simulate_renewal_cases`
+        past_cases : np.ndarray
+            Optional. Only for 'renewal'. The daily cases of the last days, sorted from oldest to most current date. Defaults to the current 7 day mean on each day
+        generation : np.ndarray
+            Optional. Only for 'renewal'. The generation interval weights by lag, see `generation_interval`
+        window_length : int
+            The amount of days to check where a threshold migth be reached
+        return_threshold_days : bool
+            Whether to calculate threshold days or not
+        """
+        try:
+            R_matrix=schedule_matrix(schedules,window_length)
+            if engine=='renewal':
+                generation=generation_interval() if generation is None else generation
+                if past_cases is None:
+                    past_cases=np.full(len(generation)-1,self.input_new_cases_avg,dtype=np.float64)
+                cases_matrix=renewal_schedule_cases(R_matrix,past_cases,generation)
+            else:
+                # the daily change of the linear trend follows the R of that day; a constant R gives the ramp of `simulate_new_cases`
+                steps=(R_matrix**(7/4)-1)/7
+                steps[:,0]=0
+                cases_matrix=(1+np.cumsum(steps,axis=1))*self.input_new_cases_avg
+            self.schedule_R=R_matrix
+            self.store_scenarios(cases_matrix,return_threshold_days,labels=[schedule_label(schedule) for schedule in schedules],final_R=R_matrix[:,-1])
 
+        except Exception as e:
+            logger.error(e)
 
+    def store_scenarios(self,cases_matrix,return_threshold_days=True,labels=None,final_R=None):
+        """
+        Calculates the cases per 100k of the simulated (scenario x day) cases and stores them in the formats used by the threshold tables
 
-    def verify_threshold(self, simulated_cases_per100k,threshold,interval=7,returnDates=False):
+        Parameters
+        ----------
+        cases_matrix : np.ndarray
+            The simulated daily cases, one row per scenario. Defaults to one row per growth factor in `self.delta_range`
+        return_threshold_days : bool
+            Whether to calculate threshold days or not
+        labels : list
+            Optional. The names of the scenarios in the tables. Defaults to the assumed R values
+        final_R : np.ndarray
+            Optional. The R of each scenario on the last simulated day. Decides whether a scenario belongs to the falling or the rising tables
+        """
+        self.cases_matrix=cases_matrix
+        case_sums=rolling_sums(cases_matrix,(7,14),reversed_dates=False) # the first 7 (14) days without a complete window are NaN
+        self.per100k_7d_matrix=np.round((case_sums[7]/self.input_population)*100000,2)
+        self.per100k_14d_matrix=np.round((case_sums[14]/self.input_population)*100000,2)
+
+        self.scenario_labels=list(self.input_r_range) if labels is None else list(labels)
+        self.scenario_final_R=np.asarray(self.input_r_range if final_R is None else final_R,dtype=np.float64)
+        self.scenario_keys=self.delta_range.tolist() if labels is None else self.scenario_labels
+        self.set_scenario_views()
+
+        # calculates after how many days under an assumed R_0 a threshold is reached.
+        if return_threshold_days:
+            self.threshold_days7=[self.scenario_labels]+self.threshold_dates(self.per100k_7d_matrix,interval=7)
+            self.threshold_days14=[self.scenario_labels]+self.threshold_dates(self.per100k_14d_matrix,interval=14)
+
+    def set_scenario_views(self):
+        """ Creates the dictionaries by growth factor (by label for schedules) and the date prefixed lists. Their rows are views of the scenario matrices """
+        # create range of dates and insert it at the beginning of the list
+        base = date.today().toordinal()
+        date_list = to_iso(np.arange(base,base+self.cases_matrix.shape[1]))
+
+        self.in_FC_cases_per100k_7d=dict(zip(self.scenario_keys,self.per100k_7d_matrix))
+        self.in_FC_cases_per100k_14d=dict(zip(self.scenario_keys,self.per100k_14d_matrix))
+        self.cases_new=[date_list]+list(np.round(self.cases_matrix,2))
+        self.casesPer100k_7d=[date_list]+list(self.per100k_7d_matrix)
+        self.casesPer100k_14d=[date_list]+list(self.per100k_14d_matrix)
+
+    def threshold_dates(self,per100k_matrix,interval=7):
         """
-        Subfunction of simulate_threshold_dates.  Calculates after how many days a threshold is reached
+        Calculates the dates on which the thresholds are reached for all simulated R. A threshold below the first simulated value is reached when the
+        cases per 100k fall below it, otherwise when they rise above it
 
         Parameters
         ----------
-        FC_cases_per100k : list
-            The list of cases per 100k, based on simulated daily new covid infections using an assumed R_0
-        threshold : int
-            An integer indicating which thresholds needs to be reached
+        per100k_matrix : np.ndarray
+            The (growth factor x day) matrix of simulated cases per 100k
         interval : int
             An integer specifying 7 if we base our calculation of cases per 100k on a 7-day period
             
         Returns
         -------
-        integer or nan
-            An integer of how many days it takes to reach that threshold or nan if the threshold can't be reached
+        list
+            One list per threshold with the dates in isoformat (None if the threshold can't be reached) for each R
         """
         try:
-            FC_cases_per100k=simulated_cases_per100k[interval:]
-            if threshold<FC_cases_per100k[0]:
-                index_threshold=next((x[0] for x in enumerate(FC_cases_per100k) if x[1] < threshold),None)
-            else:
-                index_threshold=next((x[0] for x in enumerate(FC_cases_per100k) if x[1] > threshold),None)
-            
-            if index_threshold is not None:
-                if returnDates:
-                    return index_threshold+interval
-                else:
-                    days_till_threshold=index_threshold+interval
-                    threshold_date = datetime.today()+timedelta(days=days_till_threshold)
-                    return(threshold_date.date().isoformat())
+            thresholds=np.asarray(self.input_thresholds,dtype=np.float64)
+            below=thresholds[:,None]<per100k_matrix[:,interval][None,:]
+            days=crossing_days(per100k_matrix,thresholds,first_day=interval,below=below)
+            dates=to_iso(date.today().toordinal()+np.maximum(days,0))
+            return [[None if day==NO_CROSSING else iso for day,iso in zip(th_days,th_dates)] for th_days,th_dates in zip(days.tolist(),dates)]
 
-            else:
-                return None
-            
         except Exception as e:
             logger.error(e)
 
@@ -1,11 +1,12 @@
 import json
-from datetime import datetime
 from loguru import logger
-import sass
+from date_normalisation import to_iso, to_weekday_names
+from transform_enrich import COUNT_COLUMNS, to_output
 
 class historical_table:
     def compile_css(colors_obj,country):
         try:
+            import sass # libsass is only needed to write the tables
             scss = """\
             $headerBackgroundColor: """+ colors_obj.get('colorHeaderBG')+""";
             $headerTextColor: """+ colors_obj.get('colorHeaderFont')+""";
@@ -41,10 +42,12 @@ class historical_table:
             A list of dictionaries for each entry.
         """
         try:
-            dates=history_obj.data7[0]
-            data=history_obj.data7 # Simplification for the time being
-            cases=history_obj.data7[1]
-            day_of_week=[datetime.fromisoformat(x).strftime('%A') for x in dates]
+            table=history_obj.table7
+            dates=to_iso(table['Date']) # the dates are carried as day ordinals and formatted here in one go
+            # the columns are NumPy arrays: they are rounded and converted to python numbers (NaN to None) once per column
+            data=[to_output(column,0 if name in COUNT_COLUMNS else 2) for name,column in table.items()]
+            cases=data[table.index['New Cases']]
+            day_of_week=to_weekday_names(table['Date'])
 
             result_list=[]
             base_dict_list=[]